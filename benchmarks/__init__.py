@@ -0,0 +1,2 @@
+
+from .fake_ultra import FakeUltra, make_courses
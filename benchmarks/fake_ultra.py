@@ -0,0 +1,404 @@
+# benchmarks/fake_ultra.py
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = 'BbRouter'
+PAGE_LIMIT = 200
+FOLDER = 'resource/x-bb-folder'
+FILE = 'resource/x-bb-file'
+DOCUMENT = 'resource/x-bb-document'
+
+# 展开文件夹时按需加载内容，与Ultra一样由 aria-expanded/aria-busy 表示状态
+OUTLINE_JS = """
+document.addEventListener('click', async (event) => {
+    const button = event.target.closest("button[id^='folder-title-']");
+    if (!button) return;
+    const box = document.getElementById(button.getAttribute('aria-controls'));
+    if (button.getAttribute('aria-expanded') === 'true') {
+        button.setAttribute('aria-expanded', 'false');
+        box.innerHTML = '';
+        return;
+    }
+    box.setAttribute('aria-busy', 'true');
+    const response = await fetch(button.dataset.src, {credentials: 'same-origin'});
+    box.innerHTML = await response.text();
+    box.removeAttribute('aria-busy');
+    button.setAttribute('aria-expanded', 'true');
+});
+"""
+
+
+class Item:
+    """One content item of a synthetic course"""
+
+    def __init__(self, content_id, title, handler, size=0, children=None, ext='pdf'):
+        self.id = content_id
+        self.title = title
+        self.handler = handler
+        self.size = size
+        self.children = children or []
+        self.ext = ext
+
+    @property
+    def file_name(self):
+        return f'{self.title}.{self.ext}'
+
+    def payload(self):
+        """Deterministic file bytes, different for every item"""
+        block = hashlib.sha256(self.id.encode()).digest() * 2048
+        offset = 0
+        while offset < self.size:
+            chunk = block[:self.size - offset]
+            offset += len(chunk)
+            yield chunk
+
+    def etag(self):
+        return '"' + hashlib.md5(f'{self.id}:{self.size}'.encode()).hexdigest() + '"'
+
+
+class Course:
+    def __init__(self, course_id, name, root):
+        self.id = course_id
+        self.name = name
+        self.root = root  # 顶层的内容列表
+
+
+def make_courses(courses=1, weeks=10, items=8, file_size=200000, documents=0.25, lectures_title='Lectures'):
+    """
+    Generate synthetic courses.
+
+    Each course has a `lectures_title` folder with `weeks` week folders of
+    `items` items; a `documents` fraction of them are documents with a PDF
+    attachment, the rest are PDF/PPTX files of about `file_size` bytes.
+    """
+    counter = iter(range(100000, 10 ** 9))
+
+    def next_id():
+        return f'_{next(counter)}_1'
+
+    result = []
+    for c in range(courses):
+        week_folders = []
+        for w in range(1, weeks + 1):
+            contents = []
+            for i in range(1, items + 1):
+                size = int(file_size * (0.5 + (i % 4) / 4))
+                if i <= items * documents:
+                    contents.append(Item(next_id(), f'Reading {w}.{i}', DOCUMENT, size))
+                else:
+                    ext = 'pptx' if i % 3 == 0 else 'pdf'
+                    contents.append(Item(next_id(), f'Lecture {w}.{i}', FILE, size, ext=ext))
+            week_folders.append(Item(next_id(), f'Week {w} - Topic {w}', FOLDER, children=contents))
+        lectures = Item(next_id(), lectures_title, FOLDER, children=week_folders)
+        syllabus = Item(next_id(), 'Course Information', FOLDER, children=[
+            Item(next_id(), 'Syllabus', FILE, file_size)])
+        result.append(Course(f'_{66000 + c}_1', f'Course {c + 1}', [syllabus, lectures]))
+    return result
+
+
+class FakeUltra(ThreadingHTTPServer):
+    """
+    A local server imitating the parts of Blackboard Ultra the crawler uses.
+
+    Serves the login form, the course outline with lazily expanded
+    `folder-title-*` buttons, content pages with a Download button, file
+    downloads, and the public/private JSON content endpoints used by
+    OutlineClient and HttpDownloader. Every request waits `latency` seconds;
+    the next `throttle` file downloads are answered with 429.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, courses, latency=0.0, address=('127.0.0.1', 0), username='bench', password='bench'):
+        super().__init__(address, FakeUltraHandler)
+        self.courses = {course.id: course for course in courses}
+        self.latency = latency
+        self.credentials = (username, password)
+        self.items = {}
+        for course in courses:
+            stack = list(course.root)
+            while stack:
+                item = stack.pop()
+                self.items[item.id] = (course, item)
+                stack.extend(item.children)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.throttle = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def origin(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def course_url(self, course):
+        return f'{self.origin}/ultra/courses/{course.id}/outline'
+
+    def count(self, sent=0):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent
+
+    def take_throttle(self):
+        """True if this request should be throttled (uses up one of `throttle`)"""
+        with self._lock:
+            if self.throttle <= 0:
+                return False
+            self.throttle -= 1
+            return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-ultra', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+ROUTES = []
+
+
+def route(method, pattern):
+    def register(func):
+        ROUTES.append((method, re.compile(pattern + '$'), func))
+        return func
+    return register
+
+
+class FakeUltraHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_HEAD(self):
+        self._dispatch('HEAD')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parsed = urlparse(self.path)
+        self.query = parse_qs(parsed.query)
+        for route_method, pattern, func in ROUTES:
+            match = pattern.match(parsed.path)
+            if match and (route_method == method or (route_method == 'GET' and method == 'HEAD')):
+                if func.__name__ != 'login' and not self.logged_in():
+                    return self.not_logged_in(parsed.path)
+                return func(self, **match.groupdict())
+        self.send_text(404, 'not found')
+
+    # ---- helpers ----
+
+    def logged_in(self):
+        return f'{SESSION_COOKIE}=' in (self.headers.get('Cookie') or '')
+
+    def not_logged_in(self, path):
+        if path.startswith('/learn/api/') or path.startswith('/bbcswebdav/'):
+            return self.send_text(401, 'unauthorized')
+        return self.send_html(LOGIN_PAGE.format(next=escape(self.path)))
+
+    def send_bytes(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        self.server.count(len(body) if self.command != 'HEAD' else 0)
+
+    def send_text(self, status, text):
+        self.send_bytes(status, text.encode(), 'text/plain; charset=utf-8')
+
+    def send_html(self, html, headers=None):
+        self.send_bytes(200, html.encode(), 'text/html; charset=utf-8', headers)
+
+    def send_json(self, data):
+        self.send_bytes(200, json.dumps(data).encode(), 'application/json')
+
+    def lookup(self, course_id, content_id):
+        course, item = self.server.items.get(content_id, (None, None))
+        if not course or course.id != course_id:
+            self.send_text(404, 'no such content')
+            return None
+        return item
+
+    # ---- pages ----
+
+    @route('POST', r'/webapps/login/')
+    def login(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode())
+        user = (form.get('user_id') or [''])[0], (form.get('password') or [''])[0]
+        if user != self.server.credentials:
+            return self.send_html(LOGIN_PAGE.format(next=escape((form.get('next') or ['/'])[0])))
+        self.send_response(303)
+        self.send_header('Location', (form.get('next') or ['/'])[0])
+        self.send_header('Set-Cookie', f'{SESSION_COOKIE}=session-{time.time_ns()}; Path=/; HttpOnly')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.server.count()
+
+    @route('GET', r'/ultra/courses/(?P<course_id>_\d+_\d+)/outline')
+    def outline(self, course_id):
+        course = self.server.courses.get(course_id)
+        if not course:
+            return self.send_text(404, 'no such course')
+        self.send_html(PAGE.format(title=escape(course.name), body=folder_html(course, course.root),
+                                   script=OUTLINE_JS))
+
+    @route('GET', r'/ultra/courses/(?P<course_id>_\d+_\d+)/outline/folder/(?P<content_id>_\d+_\d+)')
+    def folder(self, course_id, content_id):
+        item = self.lookup(course_id, content_id)
+        if item:
+            self.send_html(folder_html(self.server.courses[course_id], item.children))
+
+    @route('GET', r'/ultra/courses/(?P<course_id>_\d+_\d+)/outline/(?:file|edit/document)/(?P<content_id>_\d+_\d+)')
+    def content(self, course_id, content_id):
+        item = self.lookup(course_id, content_id)
+        if item:
+            self.send_html(PAGE.format(title=escape(item.title), body=CONTENT_BODY.format(
+                title=escape(item.title), href=escape(file_path(course_id, item))), script=''))
+
+    @route('GET', r'/bbcswebdav/(?P<course_id>_\d+_\d+)/(?P<content_id>_\d+_\d+)/(?P<name>[^/]+)')
+    def file(self, course_id, content_id, name):
+        item = self.lookup(course_id, content_id)
+        if not item:
+            return
+        if self.command != 'HEAD' and self.server.take_throttle():
+            return self.send_bytes(429, b'too many requests', 'text/plain', {'Retry-After': '0'})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(item.size))
+        self.send_header('ETag', item.etag())
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(item.file_name)}")
+        self.end_headers()
+        sent = 0
+        if self.command != 'HEAD':
+            for chunk in item.payload():
+                self.wfile.write(chunk)
+                sent += len(chunk)
+        self.server.count(sent)
+
+    # ---- JSON endpoints ----
+
+    @route('GET', r'/learn/api/public/v1/courses/(?P<course_id>_\d+_\d+)/contents')
+    def root_contents(self, course_id):
+        course = self.server.courses.get(course_id)
+        if not course:
+            return self.send_text(404, 'no such course')
+        self.send_page(course.id, course.root, f'/learn/api/public/v1/courses/{course_id}/contents')
+
+    @route('GET', r'/learn/api/public/v1/courses/(?P<course_id>_\d+_\d+)/contents/(?P<content_id>_\d+_\d+)/children')
+    def children(self, course_id, content_id):
+        item = self.lookup(course_id, content_id)
+        if item:
+            self.send_page(course_id, item.children,
+                           f'/learn/api/public/v1/courses/{course_id}/contents/{content_id}/children')
+
+    def send_page(self, course_id, items, base):
+        offset = int((self.query.get('offset') or ['0'])[0])
+        limit = min(int((self.query.get('limit') or [PAGE_LIMIT])[0]), PAGE_LIMIT)
+        page = items[offset:offset + limit]
+        data = {'results': [{'id': item.id, 'title': item.title, 'contentHandler': {'id': item.handler}}
+                            for item in page]}
+        if offset + limit < len(items):
+            data['paging'] = {'nextPage': f'{base}?offset={offset + limit}&limit={limit}'}
+        self.send_json(data)
+
+    @route('GET', r'/learn/api/v1/courses/(?P<course_id>_\d+_\d+)/contents/(?P<content_id>_\d+_\d+)')
+    def content_detail(self, course_id, content_id):
+        item = self.lookup(course_id, content_id)
+        if not item:
+            return
+        data = {'id': item.id, 'title': item.title, 'contentHandler': {'id': item.handler}}
+        if item.handler == FILE:
+            data['contentDetail'] = {FILE: {'file': {
+                'fileName': item.file_name, 'permanentUrl': file_path(course_id, item)}}}
+        self.send_json(data)
+
+    @route('GET', r'/learn/api/public/v1/courses/(?P<course_id>_\d+_\d+)/contents/(?P<content_id>_\d+_\d+)/attachments')
+    def attachments(self, course_id, content_id):
+        item = self.lookup(course_id, content_id)
+        if not item:
+            return
+        results = []
+        if item.handler == DOCUMENT:
+            results.append({'id': 'att' + item.id, 'fileName': item.file_name})
+        self.send_json({'results': results})
+
+    @route('GET', r'/learn/api/public/v1/courses/(?P<course_id>_\d+_\d+)/contents/(?P<content_id>_\d+_\d+)/attachments/(?P<attachment_id>[^/]+)/download')
+    def attachment_download(self, course_id, content_id, attachment_id):
+        self.file(course_id, content_id, 'download')
+
+
+def file_path(course_id, item):
+    return f'/bbcswebdav/{course_id}/{item.id}/{quote(item.file_name)}'
+
+
+def content_href(course_id, item):
+    if item.handler == FILE:
+        return f'/ultra/courses/{course_id}/outline/file/{item.id}'
+    return f'/ultra/courses/{course_id}/outline/edit/document/{item.id}'
+
+
+def folder_html(course, items):
+    """Render folder buttons (collapsed) and content links the way the Ultra outline does"""
+    parts = []
+    for item in items:
+        if item.handler == FOLDER:
+            parts.append(FOLDER_ROW.format(
+                id=item.id, title=escape(item.title),
+                src=f'/ultra/courses/{course.id}/outline/folder/{item.id}'))
+        else:
+            parts.append(LINK_ROW.format(href=content_href(course.id, item), title=escape(item.title)))
+    return '\n'.join(parts)
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body><div id="main-content">
+{body}
+</div><script>{script}</script></body></html>"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Sign In</title></head>
+<body><form method="post" action="/webapps/login/">
+<input type="text" id="user_id" name="user_id">
+<input type="password" id="password" name="password">
+<input type="hidden" name="next" value="{next}">
+<button type="submit" id="entry-login">Sign In</button>
+</form></body></html>"""
+
+FOLDER_ROW = """<div class="content-row">
+<button id="folder-title-{id}" class="MuiButtonBase-root" aria-controls="folder-contents-{id}" aria-expanded="false" data-src="{src}">{title}</button>
+<div id="folder-contents-{id}"></div>
+</div>"""
+
+LINK_ROW = """<div class="content-row"><a class="MuiTypography-root MuiTypography-inherit MuiLink-root" href="{href}">{title}</a></div>"""
+
+CONTENT_BODY = """<h1>{title}</h1>
+<div class="makeStyles-toolbar">
+<button class="MuiButtonBase-root MuiIconButton-root" aria-label="More options"><svg class="MuiSvgIcon-root ms-Button-icon" viewBox="0 0 24 24"><path d="M6 10h4v4H6z"></path></svg></button>
+<button class="MuiButtonBase-root" aria-label="Download" onclick="location.href='{href}'"><svg class="MuiSvgIcon-root ms-Button-icon" viewBox="0 0 24 24"><path d="M5 20h14v-2H5z"></path></svg>Download</button>
+</div>"""
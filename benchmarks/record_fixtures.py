@@ -0,0 +1,85 @@
+# benchmarks/record_fixtures.py
+"""
+从模拟站点录制 blackboard/fixtures 下的 OutlineClient JSON fixture。
+
+用法：python -m benchmarks.record_fixtures
+"""
+
+import logging
+import os
+
+import requests
+
+from blackboard.outline import OutlineClient
+from blackboard.outline_fixtures import FIXTURES_DIR, record
+
+from . import fake_ultra
+from .fake_ultra import FakeUltra, Item, make_courses, DOCUMENT, FILE, FOLDER
+from .run import login
+
+# 模拟站点的内容类型 -> Ultra 打开它的路径
+PATHS = {FILE: 'outline/file', DOCUMENT: 'outline/edit/document'}
+
+
+def _courses():
+    small, paged, untitled = make_courses(3, weeks=3, items=4)
+    # Lectures 下的散项和周文件夹里的子文件夹
+    lectures = small.root[1]
+    lectures.children.insert(0, Item('_990001_1', 'Module handbook', FILE, 1000))
+    lectures.children[1].children.append(Item('_990002_1', 'Extra material', FOLDER, children=[
+        Item('_990003_1', 'Lecture 1.5 Pumping lemma', FILE, 1000)]))
+    # 没有 Lectures 文件夹时使用顶层文件夹
+    untitled.root[1].title = 'Teaching'
+    return {'small': (small, 'Lectures'), 'paged': (paged, 'Lectures'), 'no_lectures': (untitled, 'Lectures')}
+
+
+def _expected(server, course, lectures_title):
+    """
+    The (href, title, week) list a course should yield, read off the course model.
+
+    Loose items of the lectures folder come first under its own title, then
+    every file and document of each week folder (sub folders included, in
+    outline order) under the week title.
+    """
+    def url(item):
+        return f"{server.origin}/ultra/courses/{course.id}/{PATHS[item.handler]}/{item.id}"
+
+    def walk(folder):
+        for item in folder.children:
+            if item.handler == FOLDER:
+                yield from walk(item)
+            else:
+                yield item
+
+    lectures = next((item for item in course.root if item.handler == FOLDER and lectures_title in item.title), None)
+    entries = lectures.children if lectures else course.root
+    links = [(url(item), item.title, lectures.title) for item in entries if lectures and item.handler != FOLDER]
+    for week in entries:
+        if week.handler == FOLDER:
+            links.extend((url(item), item.title, week.title) for item in walk(week))
+    return links
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    courses = _courses()
+    server = FakeUltra([course for course, _ in courses.values()]).start()
+    session = requests.Session()
+    session.cookies.update(login(server))
+    session.headers['Accept'] = 'application/json'
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    try:
+        for name, (course, lectures_title) in courses.items():
+            # 'paged' 每页只返回 3 条，覆盖 paging.nextPage
+            fake_ultra.PAGE_LIMIT = 3 if name == 'paged' else 200
+            client = OutlineClient(server.origin, session=session)
+            record(client, server.course_url(course), os.path.join(FIXTURES_DIR, f'{name}.json'), lectures_title,
+                   expected=_expected(server, course, lectures_title))
+    finally:
+        fake_ultra.PAGE_LIMIT = 200
+        session.close()
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+# benchmarks/run.py
+"""
+用本地的模拟 Blackboard Ultra 站点端到端运行 main_v2，报告吞吐量、各阶段耗时和内存峰值。
+
+用法：python -m benchmarks.run --weeks 10 --items 8 --latency 0.02 --workers 2
+不启动浏览器，只测 API 发现和 HTTP 下载：python -m benchmarks.run --browserless
+"""
+
+import argparse
+import importlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .fake_ultra import FakeUltra, make_courses
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_MODULE = 'main_v2_LanguagesAndComputability'
+
+
+def _rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(root):
+    """Return root and every descendant pid (Chromium and its helpers)"""
+    parents = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # 第4个字段是父进程号，进程名可能含空格，从右括号之后开始解析
+                parents[int(name)] = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    result, frontier = {root}, [root]
+    while frontier:
+        pid = frontier.pop()
+        children = [child for child, parent in parents.items() if parent == pid and child not in result]
+        result.update(children)
+        frontier.extend(children)
+    return result
+
+
+class MemorySampler(threading.Thread):
+    """Sample the RSS of this process and its children (the browser) every `interval` seconds"""
+
+    def __init__(self, interval=0.5):
+        super().__init__(name='memory-sampler', daemon=True)
+        self.interval = interval
+        self.peak_total_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            total = sum(_rss_kb(pid) for pid in _descendants(os.getpid()))
+            self.peak_total_kb = max(self.peak_total_kb, total)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def write_config(workdir, server, courses, args):
+    config = {
+        'username': server.credentials[0],
+        'password': server.credentials[1],
+        'download_path': 'downloads',
+        'course_url': server.course_url(courses[0]),
+        'courses_file': 'course.json',
+        'course_workers': args.course_workers,
+        'workers': args.workers,
+        'download_mode': args.mode,
+        'http_workers': args.http_workers,
+        'discovery': args.discovery,
+        'browser_profile': 'fast',
+        # 用manifest决定下载内容，不询问起始序号
+        'incremental': True,
+        'metrics': True,
+        'metrics_dir': 'metrics',
+        'timeout': args.timeout,
+    }
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f, indent=4)
+    with open(os.path.join(workdir, 'course.json'), 'w', encoding='utf-8') as f:
+        json.dump({course.name: server.course_url(course) for course in courses}, f, indent=4, ensure_ascii=False)
+
+
+def count_downloads(root):
+    files, size = 0, 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for name in filenames:
+            if name.startswith('.') or name.endswith(('.part', '.crdownload', '.tmp', '.json')):
+                continue
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, name))
+    return files, size
+
+
+def login(server):
+    """Log in with a plain requests session and return its cookies"""
+    session = requests.Session()
+    response = session.post(server.origin + '/webapps/login/', allow_redirects=False,
+                            data={'user_id': server.credentials[0], 'password': server.credentials[1], 'next': '/'})
+    response.raise_for_status()
+    cookies = session.cookies.get_dict()
+    session.close()
+    if not cookies:
+        raise RuntimeError('login did not set a session cookie')
+    return cookies
+
+
+def run_browserless(main_v2, server, courses):
+    """
+    Run the `api` discovery and `http` download path of main_v2 without Chromium.
+
+    The session cookie comes from a requests login instead of the browser;
+    discovery, week folders, retries and downloads use the same code as
+    run_course. Items the HTTP path cannot fetch are counted, not retried in
+    a browser.
+    """
+    config = main_v2.load_config()
+    metrics = main_v2.metrics
+    metrics.configure(config['metrics'], config['metrics_dir'])
+    with metrics.span('login'):
+        cookies = login(server)
+    downloader = main_v2.HttpDownloader(cookies, timeout=config['timeout'], pool_size=config['http_workers'])
+
+    def run_one(course):
+        root = os.path.join(config['download_path'], main_v2.safe_filename(course.name))
+        client = main_v2.OutlineClient(server.origin, session=requests.Session(), timeout=config['timeout'],
+                                       workers=config['http_workers'])
+        client.session.cookies.update(cookies)
+        client.session.headers['Accept'] = 'application/json'
+        try:
+            with metrics.span('discovery_api'):
+                links = client.discover(server.course_url(course), config['lectures_title'])
+        finally:
+            client.close()
+        items = [(url, title, main_v2.create_week_folder(week, root)) for url, title, week in links]
+
+        def on_done(item, path):
+            metrics.count('files')
+            metrics.count('bytes', os.path.getsize(path))
+
+        policy = main_v2.RetryPolicy.from_config(config)
+        breaker = main_v2.CircuitBreaker(root, config['breaker_threshold'], config['breaker_cooldown'])
+        with metrics.span('http_downloads'):
+            left = downloader.download_all(items, workers=config['http_workers'], on_done=on_done,
+                                           policy=policy, breaker=breaker)
+        metrics.count('failed_items', len(left))
+
+    try:
+        with metrics.span('crawl'):
+            with ThreadPoolExecutor(max_workers=max(1, min(config['course_workers'], len(courses)))) as pool:
+                list(pool.map(run_one, courses))
+    finally:
+        downloader.close()
+        metrics.write()
+
+
+def run(args):
+    courses = make_courses(args.courses, args.weeks, args.items, args.file_size)
+    expected = sum(1 for course in courses for week in course.root[1].children for _ in week.children)
+    server = FakeUltra(courses, latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix='bb_bench_')
+    cwd = os.getcwd()
+    sampler = MemorySampler()
+    try:
+        write_config(workdir, server, courses, args)
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_ROOT)
+        # main_v2 在导入时配置日志并读取当前目录下的 config.json
+        main_v2 = importlib.import_module(MAIN_MODULE)
+
+        sampler.start()
+        start = time.perf_counter()
+        if args.browserless:
+            run_browserless(main_v2, server, courses)
+        else:
+            main_v2.main(batch=args.courses > 1)
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+        files, size = count_downloads(os.path.join(workdir, 'downloads'))
+        with open(os.path.join(workdir, 'metrics', 'run_summary.json'), encoding='utf-8') as f:
+            summary = json.load(f)
+        return {
+            'items_expected': expected,
+            'items_downloaded': files,
+            'bytes_downloaded': size,
+            'elapsed': round(elapsed, 3),
+            'items_per_sec': round(files / elapsed, 3) if elapsed else 0,
+            'phases': {name: {k: phase[k] for k in ('count', 'total', 'mean', 'max')}
+                       for name, phase in summary['phases'].items()},
+            'counters': summary['counters'],
+            'peak_rss_python_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'peak_rss_total_mb': round(sampler.peak_total_kb / 1024, 1),
+            'server_requests': server.requests,
+            'workdir': workdir,
+        }
+    finally:
+        os.chdir(cwd)
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='main_v2 offline benchmark')
+    parser.add_argument('--courses', type=int, default=1)
+    parser.add_argument('--weeks', type=int, default=10)
+    parser.add_argument('--items', type=int, default=8, help='每周的内容数')
+    parser.add_argument('--file-size', type=int, default=200000, help='平均文件大小（字节）')
+    parser.add_argument('--latency', type=float, default=0.02, help='服务器每个请求的延迟（秒）')
+    parser.add_argument('--mode', choices=['browser', 'http'], default='browser')
+    parser.add_argument('--discovery', choices=['api', 'dom'], default='api')
+    parser.add_argument('--workers', type=int, default=1, help='并行下载的标签页数')
+    parser.add_argument('--http-workers', type=int, default=8)
+    parser.add_argument('--course-workers', type=int, default=3)
+    parser.add_argument('--timeout', type=int, default=10)
+    parser.add_argument('--browserless', action='store_true',
+                        help='不启动Chromium，用requests登录后只运行API发现和HTTP下载（需要 --mode http --discovery api）')
+    parser.add_argument('--keep', action='store_true', help='保留工作目录（下载文件、日志、指标）')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    args = parser.parse_args()
+    if args.browserless:
+        if args.discovery != 'api':
+            parser.error('--browserless only supports --discovery api')
+        args.mode = 'http'
+
+    report = run(args)
+    print(f"下载 {report['items_downloaded']}/{report['items_expected']} 个文件，"
+          f"{report['bytes_downloaded'] / 1e6:.1f} MB，用时 {report['elapsed']:.1f}s，"
+          f"{report['items_per_sec']:.2f} 个/秒")
+    print(f"内存峰值：Python {report['peak_rss_python_mb']} MB，含浏览器 {report['peak_rss_total_mb']} MB，"
+          f"服务器请求 {report['server_requests']} 次")
+    print('各阶段耗时：')
+    for name, phase in sorted(report['phases'].items(), key=lambda item: -item[1]['total']):
+        print(f"  {name:>18}: {phase['total']:8.2f}s  {phase['count']:5d}次  平均 {phase['mean']:.3f}s  最长 {phase['max']:.3f}s")
+    if report['counters']:
+        print('计数：' + ', '.join(f'{k}={v:g}' for k, v in report['counters'].items()))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.keep:
+        print(f"工作目录：{report['workdir']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+
+from .workers import open_tab, download_all
+from .http_download import HttpDownloader, export_cookies, safe_filename
+from .manifest import Manifest
+from .checkpoint import Checkpoint, cleanup_partials
+from .outline import OutlineClient
+from .harvest import collect_links, filter_links, LINK_SELECTOR
+from .browser import build_options, prepare_tab
+from .retry_policy import RetryPolicy, CircuitBreaker, FailureReport, Throttled, with_retries, is_server_error
+from .blobstore import BlobStore
+from .strategies import StrategyRegistry
+from .pipeline import Pipeline, Stage
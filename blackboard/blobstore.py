@@ -0,0 +1,147 @@
+# blackboard/blobstore.py
+
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+from .manifest import file_hash
+
+logger = logging.getLogger(__name__)
+
+STORE_NAME = '.blobs'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    ext TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS remotes (
+    url TEXT NOT NULL UNIQUE,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER,
+    name TEXT,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS remotes_etag ON remotes (etag);
+CREATE INDEX IF NOT EXISTS remotes_modified ON remotes (size, name, last_modified);
+"""
+
+
+class BlobStore:
+    """
+    Content-addressed store for downloaded files.
+
+    Every file is kept once under `<download_path>/.blobs/<aa>/<sha256><ext>`
+    and hard linked (or symlinked, or copied as a last resort) into the week
+    folders. The remote metadata last seen for each content URL is
+    remembered so a file we already have is linked instead of downloaded
+    again.
+    """
+
+    def __init__(self, root, link_mode='hardlink'):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.link_mode = link_mode
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / 'index.sqlite3'), check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(remotes)')]
+        if columns and 'url' not in columns:
+            # 旧版本的表每次下载追加一行且没有URL；它只是缓存，丢掉后按URL重新记录
+            logger.info("Dropping the old remotes table of the blob store")
+            self._conn.execute('DROP TABLE remotes')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def for_download_path(cls, download_path, link_mode='hardlink'):
+        return cls(Path(download_path) / STORE_NAME, link_mode)
+
+    def blob_path(self, digest, ext):
+        return self.root / digest[:2] / (digest + ext)
+
+    def find(self, remote):
+        """
+        Return the blob matching remote metadata, or None.
+
+        A blob matches on the same ETag, or, when the server sends none, on
+        the same size, file name and Last-Modified date; size and name alone
+        are not enough (a re-uploaded slide deck often keeps both).
+        """
+        if not remote:
+            return None
+        with self._lock:
+            row = None
+            if remote.get('etag'):
+                row = self._conn.execute(
+                    'SELECT b.hash, b.ext FROM remotes r JOIN blobs b ON b.hash = r.hash WHERE r.etag = ?',
+                    (remote['etag'],)).fetchone()
+            elif remote.get('size') and remote.get('name') and remote.get('last_modified'):
+                row = self._conn.execute(
+                    'SELECT b.hash, b.ext FROM remotes r JOIN blobs b ON b.hash = r.hash '
+                    'WHERE r.size = ? AND r.name = ? AND r.last_modified = ?',
+                    (int(remote['size']), remote['name'], remote['last_modified'])).fetchone()
+        if row is None:
+            return None
+        path = self.blob_path(*row)
+        return str(path) if path.exists() else None
+
+    def add(self, path, remote=None, url=None):
+        """
+        Move a downloaded file into the store and link it back in place.
+
+        Returns the sha256 of the file. If the content is already stored the
+        new copy is dropped in favour of a link to the existing blob. The
+        `remote` metadata replaces whatever was recorded for `url` before.
+        """
+        digest = file_hash(path)
+        ext = os.path.splitext(path)[1].lower()
+        size = os.path.getsize(path)
+        blob = self.blob_path(digest, ext)
+        with self._lock:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if blob.exists():
+                if not os.path.samefile(blob, path):
+                    self._link(str(blob), path)
+            else:
+                os.replace(path, blob)
+                self._link(str(blob), path)
+            self._conn.execute('INSERT OR IGNORE INTO blobs (hash, size, ext) VALUES (?, ?, ?)', (digest, size, ext))
+            if remote and url:
+                self._conn.execute(
+                    'INSERT INTO remotes (url, etag, last_modified, size, name, hash) VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, '
+                    'size = excluded.size, name = excluded.name, hash = excluded.hash',
+                    (url, remote.get('etag'), remote.get('last_modified'),
+                     int(remote['size']) if remote.get('size') else None, remote.get('name'), digest))
+            self._conn.commit()
+        return digest
+
+    def link(self, blob, target):
+        """Link a stored blob to `target`, returning the target path"""
+        with self._lock:
+            self._link(blob, target)
+        return target
+
+    def _link(self, blob, target):
+        tmp = f"{target}.link.tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            if self.link_mode == 'symlink':
+                os.symlink(os.path.abspath(blob), tmp)
+            else:
+                os.link(blob, tmp)
+        except OSError as e:
+            # 跨文件系统或不支持链接时退回复制
+            logger.debug("Linking %s failed (%s), copying instead", blob, e)
+            shutil.copy2(blob, tmp)
+        os.replace(tmp, target)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
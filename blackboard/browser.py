@@ -0,0 +1,66 @@
+# blackboard/browser.py
+
+import logging
+from pathlib import Path
+
+from DrissionPage import ChromiumOptions
+
+logger = logging.getLogger(__name__)
+
+# 字体、媒体和第三方统计请求在抓取时没有用处
+BLOCKED_URLS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.m4a', '*.ogg',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*pendo.io*', '*newrelic.com*', '*nr-data.net*', '*hotjar.com*', '*fullstory.com*',
+]
+
+# 当前配置下每个新标签页都要拦截的地址
+_blocked_urls = []
+
+
+def build_options(config):
+    """
+    Build ChromiumOptions for the configured browser profile.
+
+    `browser_profile = 'fast'` runs headless without images, extensions or
+    audio. When `user_data_dir` is set the profile is persisted there, so
+    login cookies survive between runs, and the browser listens on
+    `browser_port` (9333 if unset) so a later run can attach to it;
+    otherwise a free port is picked.
+    """
+    co = ChromiumOptions()
+    user_data_dir = config.get('user_data_dir')
+    if user_data_dir:
+        # auto_port会使用临时的用户目录，持久化时改为固定目录和端口
+        Path(user_data_dir).mkdir(parents=True, exist_ok=True)
+        co.set_user_data_path(str(Path(user_data_dir).resolve()))
+        co.set_local_port(config.get('browser_port', 9333))
+    else:
+        co.auto_port()
+    co.timeout_base = config['timeout']
+
+    if config.get('browser_profile') == 'fast':
+        co.headless(True)
+        co.no_imgs(True)
+        co.mute(True)
+        co.set_argument('--disable-extensions')
+        co.set_argument('--disable-background-networking')
+        co.set_argument('--disable-component-update')
+        co.set_argument('--disable-dev-shm-usage')
+        _blocked_urls[:] = BLOCKED_URLS + list(config.get('blocked_urls', []))
+    else:
+        _blocked_urls[:] = list(config.get('blocked_urls', []))
+    return co
+
+
+def prepare_tab(tab):
+    """Apply request blocking of the current profile to a page or tab"""
+    if not _blocked_urls:
+        return tab
+    try:
+        tab.run_cdp('Network.enable')
+        tab.run_cdp('Network.setBlockedURLs', urls=list(_blocked_urls))
+    except Exception as e:
+        logger.warning(f"Could not enable request blocking: {e}")
+    return tab
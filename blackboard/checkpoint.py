@@ -0,0 +1,118 @@
+# blackboard/checkpoint.py
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from .waits import PARTIAL_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = '.checkpoint.json'
+
+
+class Checkpoint:
+    """
+    Crash-safe progress record of a download run.
+
+    Holds the full item list of the run plus the URLs that finished or
+    failed. Every update rewrites the file atomically (temp file + fsync +
+    os.replace), so a crash at any point leaves a valid checkpoint behind.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.items = []
+        self.done = set()
+        self.failed = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_download_path(cls, download_path):
+        return cls(Path(download_path) / CHECKPOINT_NAME)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Load the checkpoint from disk; returns False if there is none"""
+        if not self.exists():
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read checkpoint {self.path}: {e}")
+            return False
+        self.items = [tuple(item) for item in data['items']]
+        self.done = set(data['done'])
+        self.failed = dict(data['failed'])
+        return True
+
+    def start(self, items):
+        """Begin a new run over (url, title, week_folder) items"""
+        with self._lock:
+            self.items = list(items)
+            self.done = set()
+            self.failed = {}
+            self._save()
+
+    def extend(self, items):
+        """Add items discovered while the run is already going"""
+        with self._lock:
+            self.items.extend(items)
+            self._save()
+
+    def remaining(self):
+        """Items that have not finished yet, failed ones included"""
+        return [item for item in self.items if item[0] not in self.done]
+
+    def mark_done(self, item):
+        with self._lock:
+            self.done.add(item[0])
+            self.failed.pop(item[0], None)
+            self._save()
+
+    def mark_failed(self, item, error=None):
+        with self._lock:
+            self.failed[item[0]] = error or 'failed'
+            self._save()
+
+    def clear(self):
+        """Remove the checkpoint after a fully successful run"""
+        with self._lock:
+            if self.exists():
+                os.remove(self.path)
+
+    def _save(self):
+        data = {
+            'updated': time.time(),
+            'items': self.items,
+            'done': sorted(self.done),
+            'failed': self.failed,
+        }
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def cleanup_partials(root):
+    """Delete unfinished downloads (.crdownload/.part/.tmp) under root, returning their paths"""
+    removed = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(PARTIAL_SUFFIXES):
+                path = os.path.join(dirpath, name)
+                try:
+                    os.remove(path)
+                    removed.append(path)
+                except OSError as e:
+                    logger.warning(f"Could not remove partial file {path}: {e}")
+    return removed
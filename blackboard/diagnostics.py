@@ -0,0 +1,113 @@
+# blackboard/diagnostics.py
+
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 默认关闭，关闭时不会访问页面
+_state = {'enabled': False, 'directory': 'diagnostics'}
+_lock = threading.Lock()
+# 同一毫秒内的多次捕获靠序号区分
+_counter = itertools.count(1)
+
+DEFAULT_SELECTORS = [
+    'button',
+    '[role="button"]',
+    '.MuiButtonBase-root',
+    '[aria-label*="Download"]',
+    '[title*="Download"]',
+    '[data-ally-invoke]',
+]
+
+# 一次JS调用收集所有匹配元素的信息，而不是每个元素多次CDP往返
+SNAPSHOT_JS = """
+const selectors = arguments[0];
+const maxHtml = arguments[1];
+const result = {url: location.href, title: document.title, elements: {}};
+for (const selector of selectors) {
+    result.elements[selector] = Array.from(document.querySelectorAll(selector)).map(el => ({
+        tag: el.tagName.toLowerCase(),
+        text: (el.innerText || '').trim().slice(0, 200),
+        class: el.getAttribute('class'),
+        role: el.getAttribute('role'),
+        ariaLabel: el.getAttribute('aria-label'),
+        title: el.getAttribute('title'),
+        html: el.outerHTML.slice(0, maxHtml),
+    }));
+}
+return JSON.stringify(result);
+"""
+
+
+def configure(enabled=False, directory='diagnostics'):
+    """Turn diagnostics on or off and set where captures are written"""
+    _state['enabled'] = bool(enabled)
+    _state['directory'] = str(directory)
+
+
+def enabled():
+    return _state['enabled']
+
+
+def snapshot(page, selectors=None, max_html=500):
+    """Return a dict describing every element matching `selectors`, collected with a single JS call"""
+    raw = page.run_js(SNAPSHOT_JS, list(selectors or DEFAULT_SELECTORS), max_html)
+    return json.loads(raw) if isinstance(raw, str) else raw
+
+
+def log_snapshot(page, selectors=None):
+    """Log a DOM snapshot at DEBUG level; does nothing unless DEBUG logging is on"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return None
+    try:
+        data = snapshot(page, selectors)
+    except Exception as e:
+        logger.debug("Snapshot failed: %s", e)
+        return None
+    for selector, elements in data['elements'].items():
+        logger.debug("Found %d elements with selector %r", len(elements), selector)
+        for idx, element in enumerate(elements, 1):
+            logger.debug("Element %d: %s", idx, element)
+    return data
+
+
+def capture(page, title, reason, **extra):
+    """
+    Write a snapshot of the page to one JSON file for a failing item.
+
+    Only runs when diagnostics are enabled; returns the file path or None.
+    Never raises: a failed capture is logged and the caller's own error
+    handling carries on.
+    """
+    if not _state['enabled']:
+        return None
+    try:
+        return _capture(page, title, reason, extra)
+    except Exception as e:
+        logger.error("Could not write diagnostics for %s: %s", title, e)
+        return None
+
+
+def _capture(page, title, reason, extra):
+    try:
+        data = snapshot(page)
+    except Exception as e:
+        data = {'error': f"snapshot failed: {e}"}
+    now = time.time()
+    data.update({'item': title, 'reason': str(reason), 'time': now, **extra})
+
+    name = re.sub(r'[^\w.-]+', '_', str(title))[:80] or 'item'
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+    with _lock:
+        os.makedirs(_state['directory'], exist_ok=True)
+        path = os.path.join(_state['directory'], f"{stamp}-{next(_counter)}_{name}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+    logger.info("Diagnostics for %s written to %s", title, path)
+    return path
@@ -0,0 +1,170 @@
+# blackboard/harvest.py
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 页面内的收集器：注入一次，MutationObserver 记录渲染过的每个链接和文件夹，
+# 即使之后被虚拟列表移出 DOM 也不会丢；展开和滚动由页面自己完成，一次调用返回全部结果
+COLLECTOR_JS = """
+async function(linkSelector, folderSelector, rootSelector, depth, quiet, timeout) {
+    let c = window.__bbCollector;
+    if (!c || c.linkSelector !== linkSelector || c.folderSelector !== folderSelector) {
+        if (c) c.observer.disconnect();
+        c = window.__bbCollector = {linkSelector, folderSelector, links: new Map(), folders: new Map(), last: 0};
+        const text = (el) => (el.innerText || el.textContent || '').trim();
+        const contents = "div[id^='folder-contents-']";
+        const folderTitle = (el) => {
+            const box = el.closest(contents);
+            const button = box && document.querySelector(`button[aria-controls='${box.id}']`);
+            return button ? text(button) : '';
+        };
+        // 链接所在的各级文件夹内容区，从内到外；返回时按展开范围过滤
+        const boxesOf = (el) => {
+            const ids = [];
+            for (let box = el.closest(contents); box; box = box.parentElement && box.parentElement.closest(contents)) {
+                ids.push(box.id);
+            }
+            return ids;
+        };
+        const matches = (node, selector) => {
+            const found = node.matches(selector) ? [node] : [];
+            const owner = node.parentElement && node.parentElement.closest(selector);
+            if (owner) found.push(owner);
+            found.push(...node.querySelectorAll(selector));
+            return found;
+        };
+        c.record = (node) => {
+            if (node.nodeType !== 1) node = node.parentElement;
+            if (!node) return;
+            for (const a of matches(node, c.linkSelector)) {
+                const href = a.href || a.getAttribute('href') || '';
+                const old = href && c.links.get(href);
+                if (!href || (old && old.text)) continue;
+                c.links.set(href, {href, text: text(a), week: folderTitle(a), boxes: boxesOf(a)});
+            }
+            for (const b of matches(node, c.folderSelector)) {
+                c.folders.set(b.id, {id: b.id, title: text(b), controls: b.getAttribute('aria-controls') || '',
+                                     expanded: b.getAttribute('aria-expanded') === 'true', parent: folderTitle(b)});
+            }
+        };
+        c.observer = new MutationObserver((records) => {
+            c.last = performance.now();
+            for (const r of records) {
+                if (r.type !== 'childList') c.record(r.target);
+                for (const node of r.addedNodes) c.record(node);
+            }
+        });
+        c.observer.observe(document.body, {childList: true, subtree: true, characterData: true,
+                                           attributes: true, attributeFilter: ['href', 'aria-expanded']});
+        c.record(document.body);
+    }
+
+    const deadline = performance.now() + timeout;
+    let timedOut = false;
+    // 没有 aria-busy 的文件夹且 DOM 安静 quiet 毫秒，即认为渲染完成；
+    // 刚点击或滚动过，懒加载可能还没开始，所以从调用时刻开始计时
+    const settle = () => new Promise((resolve) => {
+        c.last = Math.max(c.last, performance.now());
+        const check = () => {
+            const now = performance.now();
+            if (now >= deadline) { timedOut = true; return resolve(); }
+            const busy = document.querySelector("div[id^='folder-contents-'][aria-busy='true']");
+            const idle = now - c.last;
+            if (!busy && idle >= quiet) return resolve();
+            setTimeout(check, busy ? 50 : Math.max(10, quiet - idle));
+        };
+        check();
+    });
+    const scroller = (el) => {
+        for (let node = el && el.parentElement; node; node = node.parentElement) {
+            const style = getComputedStyle(node);
+            if (/(auto|scroll)/.test(style.overflowY) && node.scrollHeight > node.clientHeight) return node;
+        }
+        return document.scrollingElement || document.documentElement;
+    };
+
+    const root = rootSelector ? document.querySelector(rootSelector) : null;
+    let scope = document;
+    if (root) {
+        if (root.getAttribute('aria-expanded') === 'false') {
+            root.click();
+            await settle();
+        }
+        scope = document.getElementById(root.getAttribute('aria-controls')) || document;
+    }
+    // 逐层展开：同一层的文件夹一起点击，再等待全部加载
+    const clicked = new Set(root ? [root.id] : []);
+    for (let level = 0; level < depth && !timedOut; level++) {
+        const pending = Array.from(scope.querySelectorAll(folderSelector))
+            .filter((b) => !clicked.has(b.id) && b.getAttribute('aria-expanded') === 'false');
+        if (!pending.length) break;
+        for (const b of pending) {
+            clicked.add(b.id);
+            b.click();
+        }
+        await settle();
+    }
+    // 分屏滚动，让懒加载和虚拟列表渲染出每一段，直到滚到底且高度不再变化
+    const box = scroller(scope === document ? document.querySelector(folderSelector) : scope);
+    while (!timedOut) {
+        const height = box.scrollHeight;
+        if (box.scrollTop + box.clientHeight >= height - 2) {
+            await settle();
+            if (box.scrollHeight === height) break;
+        }
+        const top = box.scrollTop;
+        box.scrollTop = Math.min(top + Math.max(box.clientHeight, 200), height);
+        await settle();
+        // 容器不能滚动（例如 overflow: hidden）时不再继续
+        if (box.scrollTop === top && box.scrollHeight === height) break;
+    }
+    // 只返回展开范围内的链接：指定了 root 时是它的内容区，否则是任意文件夹内的链接，
+    // 不包括目录顶层的条目和课程导航
+    const inScope = scope === document ? (link) => link.boxes.length > 0 : (link) => link.boxes.includes(scope.id);
+    const links = Array.from(c.links.values()).filter(inScope).map(({href, text, week}) => ({href, text, week}));
+    return JSON.stringify({links, folders: Array.from(c.folders.values()), complete: !timedOut});
+}
+"""
+
+LINK_SELECTOR = "a[class*='MuiTypography']"
+FOLDER_SELECTOR = "button[id^='folder-title-'][aria-controls^='folder-contents-']"
+
+
+def filter_links(links, week_text=None):
+    """Keep course content links and return them as (href, title, week) tuples"""
+    valid = []
+    for link in links:
+        href, text = link.get('href'), link.get('text')
+        if href and text and '/ultra/courses/' in href:
+            valid.append((href, text, week_text or link.get('week', '')))
+    return valid
+
+
+def collect_links(page, root=None, depth=1, link_selector=LINK_SELECTOR, folder_selector=FOLDER_SELECTOR,
+                  quiet=0.3, timeout=60):
+    """
+    Expand and scroll the outline inside the page and return (links, folders).
+
+    `root` is a CSS selector for the folder button to start from (e.g. the
+    Lectures folder); it is expanded, then `depth` levels of folders below
+    it (the whole outline when `root` is None). Folders of one level are
+    clicked together and the page scrolls screen by screen, each step
+    waiting only until no folder is loading and the DOM has been quiet for
+    `quiet` seconds. A MutationObserver installed on the first call records
+    every link and folder as it renders, so items that Ultra later
+    virtualizes away are still returned.
+
+    Only links inside the expanded scope are returned (below `root`, or in
+    any folder when `root` is None) as dicts with `href`, `text` and `week`
+    (the title of the nearest folder). Folders have `id`, `title`,
+    `controls`, `expanded` and `parent`. Runs a single `page.run_js`.
+    """
+    raw = page.run_js(COLLECTOR_JS, link_selector, folder_selector, root, depth, quiet * 1000, timeout * 1000,
+                      timeout=timeout + 5)
+    result = json.loads(raw) if isinstance(raw, str) else (raw or {})
+    if not result.get('complete', True):
+        logger.warning(f"Outline still loading after {timeout}s, returning the links collected so far")
+    return result.get('links', []), result.get('folders', [])
+
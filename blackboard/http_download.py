@@ -0,0 +1,300 @@
+# blackboard/http_download.py
+
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse, unquote
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+from . import metrics
+from .retry_policy import Throttled, with_retries
+
+logger = logging.getLogger(__name__)
+
+# /ultra/courses/_66721_1/outline/file/_4390001_1
+CONTENT_URL_RE = re.compile(r'/ultra/courses/(?P<course>_\d+_\d+)/.*?(?P<content>_\d+_\d+)(?:[/?#]|$)')
+CHUNK_SIZE = 1 << 16
+THROTTLE_STATUS = (429, 503)
+
+
+def export_cookies(page):
+    """Export the browser session cookies as a {name: value} dict"""
+    try:
+        cookies = page.cookies()
+    except TypeError:
+        # 旧版本DrissionPage
+        cookies = page.get_cookies()
+    if isinstance(cookies, dict):
+        return dict(cookies)
+    return {c['name']: c['value'] for c in cookies}
+
+
+def parse_content_url(url):
+    """Return (origin, course_id, content_id) for an Ultra content link, or None"""
+    match = CONTENT_URL_RE.search(url)
+    if not match:
+        return None
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}", match.group('course'), match.group('content')
+
+
+def safe_filename(name):
+    """Strip characters that are not allowed in file names"""
+    name = re.sub(r'[\\/:*?"<>|\r\n]+', '_', name).strip(' .')
+    return name or 'download'
+
+
+class HttpDownloader:
+    """
+    Download course files over plain HTTP with the cookies of a logged-in browser.
+
+    Content links are resolved through the JSON endpoints the Ultra UI uses
+    to the underlying file URL, which is then streamed to disk with a pooled
+    keep-alive session. Items that cannot be resolved are handed back so the
+    caller can fall back to the browser.
+    """
+
+    def __init__(self, cookies, user_agent=None, timeout=10, pool_size=8, store=None):
+        self.timeout = timeout
+        # 可选的BlobStore，已有相同内容时直接链接而不下载
+        self.store = store
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.cookies.update(cookies)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        self.session.headers['Accept'] = 'application/json, */*'
+        # url -> 远程文件的元数据（大小、ETag、Last-Modified）
+        self.meta = {}
+        self._resolved = {}
+        self._remote = {}
+        # remote_meta_all 在多个线程里同时填充这两个缓存
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_page(cls, page, timeout=10, pool_size=8, store=None):
+        """Build a downloader sharing the session of a ChromiumPage"""
+        user_agent = None
+        try:
+            user_agent = page.user_agent
+        except Exception as e:
+            logger.debug(f"Could not read user agent: {e}")
+        return cls(export_cookies(page), user_agent=user_agent, timeout=timeout, pool_size=pool_size, store=store)
+
+    def _get_json(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        _check_throttled(response)
+        if response.status_code != 200:
+            logger.debug(f"GET {url} -> {response.status_code}")
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def resolve(self, url):
+        """Resolve a content link to (file_url, file_name), or None"""
+        with self._cache_lock:
+            if url in self._resolved:
+                return self._resolved[url]
+        resolved = self._resolve(url)
+        with self._cache_lock:
+            return self._resolved.setdefault(url, resolved)
+
+    def _resolve(self, url):
+        parsed = parse_content_url(url)
+        if not parsed:
+            return None
+        origin, course_id, content_id = parsed
+
+        # 1. 文件类型的内容直接带有permanentUrl
+        content = self._get_json(f"{origin}/learn/api/v1/courses/{course_id}/contents/{content_id}")
+        if content:
+            file_info = (content.get('contentDetail') or {}).get('resource/x-bb-file', {}).get('file') or {}
+            if file_info.get('permanentUrl'):
+                return urljoin(origin, file_info['permanentUrl']), file_info.get('fileName')
+
+        # 2. 文档类型的内容通过附件下载
+        base = f"{origin}/learn/api/public/v1/courses/{course_id}/contents/{content_id}/attachments"
+        attachments = self._get_json(base)
+        results = (attachments or {}).get('results') or []
+        if results:
+            first = results[0]
+            return f"{base}/{first['id']}/download", first.get('fileName')
+        return None
+
+    def remote_meta(self, url):
+        """Return the remote metadata of a content link without downloading it"""
+        with self._cache_lock:
+            if url in self._remote:
+                return self._remote[url]
+        meta = self._remote_meta(url)
+        with self._cache_lock:
+            return self._remote.setdefault(url, meta)
+
+    def _remote_meta(self, url):
+        resolved = self.resolve(url)
+        if not resolved:
+            return None
+        try:
+            response = self.session.head(resolved[0], allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.debug(f"HEAD failed for {url}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        return _response_meta(response, resolved[1])
+
+    def known_file(self, url):
+        """Return (file name, content type) already learned for a content link, without any request"""
+        with self._cache_lock:
+            resolved = self._resolved.get(url)
+            meta = self.meta.get(url) or self._remote.get(url) or {}
+        return (resolved[1] if resolved else None) or meta.get('name'), meta.get('content_type')
+
+    def remote_meta_all(self, urls, workers=8):
+        """Fetch remote metadata for many links concurrently, returning {url: meta}"""
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return dict(zip(urls, pool.map(self._remote_meta_or_none, urls)))
+
+    def _remote_meta_or_none(self, url):
+        # 单个链接解析失败（网络错误、限流）只影响它自己，不中断整门课
+        try:
+            return self.remote_meta(url)
+        except (requests.RequestException, Throttled) as e:
+            logger.warning(f"Could not fetch remote metadata for {url}: {e}")
+            return None
+
+    def fetch(self, file_url, title, week_folder, file_name=None, url=None):
+        """Stream a file into week_folder, returning the saved path"""
+        with self.session.get(file_url, stream=True, timeout=self.timeout) as response:
+            _check_throttled(response)
+            response.raise_for_status()
+            if url:
+                self.meta[url] = _response_meta(response, file_name)
+            name = file_name or _disposition_name(response) or unquote(os.path.basename(urlparse(response.url).path))
+            ext = os.path.splitext(name or '')[1]
+            target = os.path.join(week_folder, safe_filename(title) + ext)
+            tmp = target + '.part'
+            try:
+                with open(tmp, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                os.replace(tmp, target)
+            except BaseException:
+                # 连接中断等情况下不留下半截的 .part 文件
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+        return target
+
+    def download(self, url, title, week_folder):
+        """
+        Resolve and download one item.
+
+        Returns the saved path, or False when the item cannot be resolved and
+        needs the browser. Network and HTTP errors are raised.
+        """
+        with metrics.span('http_item'):
+            return self._download(url, title, week_folder)
+
+    def _download(self, url, title, week_folder):
+        resolved = self.resolve(url)
+        if not resolved:
+            logger.info(f"Could not resolve file URL, falling back to browser: {title}")
+            return False
+        file_url, file_name = resolved
+        if self.store:
+            remote = self.remote_meta(url)
+            blob = self.store.find(remote)
+            if blob:
+                target = os.path.join(week_folder, safe_filename(title) + os.path.splitext(blob)[1])
+                self.store.link(blob, target)
+                self.meta[url] = remote
+                logger.info(f"Already stored, linked instead of downloading: {title}")
+                return target
+        path = self.fetch(file_url, title, week_folder, file_name, url=url)
+        logger.info(f"Successfully downloaded (http): {title} -> {path}")
+        return path
+
+    def _download_or_false(self, url, title, week_folder):
+        try:
+            return self.download(url, title, week_folder)
+        except Exception as e:
+            logger.warning(f"HTTP download failed for {title}: {e}")
+            return False
+
+    def download_all(self, items, workers=4, desc="Download progress (http)", on_done=None,
+                     policy=None, breaker=None):
+        """
+        Download (url, title, week_folder) items concurrently, returning the ones left for the browser.
+
+        `on_done(item, path)` is called (serialised) for every downloaded item.
+        With a `policy` failed requests are retried with backoff, and a
+        `breaker` pauses all workers while the server is throttling.
+        """
+        pending = []
+        lock = threading.Lock()
+        progress = tqdm(total=len(items), desc=desc)
+        if policy:
+            # 无法解析的条目直接交给浏览器，不重试
+            download = with_retries(self.download, policy, breaker, retry_falsy=False)
+        else:
+            download = self._download_or_false
+
+        def run(item):
+            path = download(*item)
+            with lock:
+                if path:
+                    if on_done:
+                        on_done(item, path)
+                else:
+                    pending.append(item)
+                progress.update(1)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(run, items))
+        progress.close()
+
+        order = {id(item): i for i, item in enumerate(items)}
+        pending.sort(key=lambda item: order[id(item)])
+        return pending
+
+    def close(self):
+        self.session.close()
+
+
+def _check_throttled(response):
+    if response.status_code in THROTTLE_STATUS:
+        retry_after = response.headers.get('Retry-After')
+        raise Throttled(
+            f"{response.url} -> {response.status_code}",
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+
+
+def _response_meta(response, file_name=None):
+    headers = response.headers
+    meta = {
+        'size': headers.get('Content-Length'),
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'content_type': headers.get('Content-Type'),
+        'name': file_name,
+    }
+    return {k: v for k, v in meta.items() if v}
+
+
+def _disposition_name(response):
+    disposition = response.headers.get('Content-Disposition', '')
+    match = re.search(r"filename\*=(?:UTF-8'')?([^;]+)", disposition) or re.search(r'filename="?([^";]+)"?', disposition)
+    return unquote(match.group(1)) if match else None
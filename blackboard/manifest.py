@@ -0,0 +1,128 @@
+# blackboard/manifest.py
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.manifest.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    week_folder TEXT NOT NULL,
+    path TEXT,
+    size INTEGER,
+    hash TEXT,
+    remote TEXT,
+    last_seen REAL,
+    downloaded_at REAL
+)
+"""
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Persistent record of downloaded course items, keyed by content URL.
+
+    Stored as SQLite next to the downloads (`<download_path>/.manifest.sqlite3`)
+    so that a re-run only fetches items that are new or have changed.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def for_download_path(cls, download_path):
+        return cls(Path(download_path) / MANIFEST_NAME)
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM items WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry['remote'] = json.loads(entry['remote']) if entry['remote'] else {}
+        return entry
+
+    def is_current(self, url, title, week_folder, remote=None):
+        """Return True if the item was downloaded before and nothing about it changed"""
+        entry = self.get(url)
+        if entry is None or entry['path'] is None:
+            return False
+        if entry['title'] != title or entry['week_folder'] != week_folder:
+            return False
+        if not os.path.exists(entry['path']):
+            return False
+        if remote and entry['remote']:
+            # 只比较双方都有的字段，HEAD和GET返回的头不一定完全相同
+            common = set(remote) & set(entry['remote'])
+            if any(remote[k] != entry['remote'][k] for k in common):
+                return False
+        return True
+
+    def pending(self, items, remote_meta=None):
+        """
+        Diff crawled (url, title, week_folder) items against the manifest.
+
+        `remote_meta(url)` may return a dict of remote metadata (size, ETag,
+        Last-Modified) that is compared with what was recorded at download
+        time. Every crawled item is marked as seen. Returns the items that
+        need downloading, in order.
+        """
+        todo = []
+        for url, title, week_folder in items:
+            remote = remote_meta(url) if remote_meta else None
+            if not self.is_current(url, title, week_folder, remote):
+                todo.append((url, title, week_folder))
+        self.touch([url for url, _, _ in items])
+        logger.info(f"Manifest: {len(todo)} of {len(items)} items are new or changed")
+        return todo
+
+    def touch(self, urls):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany('UPDATE items SET last_seen = ? WHERE url = ?', [(now, url) for url in urls])
+            self._conn.commit()
+
+    def record(self, url, title, week_folder, path=None, remote=None, digest=None):
+        """Record a finished download; `digest` may be passed when the hash is already known"""
+        size = None
+        if path and os.path.isfile(path):
+            size = os.path.getsize(path)
+            digest = digest or file_hash(path)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO items '
+                '(url, title, week_folder, path, size, hash, remote, last_seen, downloaded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, title, week_folder, path, size, digest, json.dumps(remote or {}), now, now),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
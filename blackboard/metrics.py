@@ -0,0 +1,171 @@
+# blackboard/metrics.py
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# 默认关闭，关闭时 span/count 只做一次判断
+_state = {'enabled': False, 'directory': 'metrics', 'started': time.time()}
+_lock = threading.Lock()
+
+# 直方图上界（秒），最后还有一个 +Inf
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SUMMARY_NAME = 'run_summary.json'
+PROM_NAME = 'blackboard.prom'
+PROM_PREFIX = 'blackboard'
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else 0,
+            'max': round(self.max, 3),
+            'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], self.buckets)),
+        }
+
+
+_histograms = defaultdict(_Histogram)
+_counters = defaultdict(float)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def configure(enabled=False, directory='metrics'):
+    """Turn metrics on or off, reset them and set where the summary is written"""
+    with _lock:
+        _state.update(enabled=bool(enabled), directory=str(directory), started=time.time())
+        _histograms.clear()
+        _counters.clear()
+
+
+def enabled():
+    return _state['enabled']
+
+
+def span(name):
+    """Context manager timing one phase; a shared no-op when metrics are off"""
+    if not _state['enabled']:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def observe(name, seconds):
+    """Record a duration in the histogram of `name`"""
+    if not _state['enabled']:
+        return
+    with _lock:
+        _histograms[name].observe(seconds)
+
+
+def count(name, value=1):
+    """Add `value` to the counter `name`"""
+    if not _state['enabled']:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+def summary():
+    """Return every phase histogram and counter as a JSON-serializable dict"""
+    with _lock:
+        return {
+            'started': _state['started'],
+            'elapsed': round(time.time() - _state['started'], 3),
+            'phases': {name: hist.as_dict() for name, hist in sorted(_histograms.items())},
+            'counters': dict(sorted(_counters.items())),
+        }
+
+
+def prometheus(data=None):
+    """Render the summary in the Prometheus text exposition format"""
+    data = data or summary()
+    lines = [
+        f'# HELP {PROM_PREFIX}_phase_seconds Time spent in each phase of the run.',
+        f'# TYPE {PROM_PREFIX}_phase_seconds histogram',
+    ]
+    for name, hist in data['phases'].items():
+        cumulative = 0
+        for bound, value in hist['buckets'].items():
+            cumulative += value
+            lines.append(f'{PROM_PREFIX}_phase_seconds_bucket{{phase="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{PROM_PREFIX}_phase_seconds_sum{{phase="{name}"}} {hist["total"]}')
+        lines.append(f'{PROM_PREFIX}_phase_seconds_count{{phase="{name}"}} {hist["count"]}')
+    for name, value in data['counters'].items():
+        metric = f'{PROM_PREFIX}_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value:g}')
+    lines.append(f'# TYPE {PROM_PREFIX}_run_duration_seconds gauge')
+    lines.append(f'{PROM_PREFIX}_run_duration_seconds {data["elapsed"]}')
+    lines.append(f'# TYPE {PROM_PREFIX}_run_start_timestamp_seconds gauge')
+    lines.append(f'{PROM_PREFIX}_run_start_timestamp_seconds {data["started"]:.0f}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path, text):
+    # node_exporter 的 textfile 收集器可能随时读取，先写临时文件再替换
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write():
+    """Write the JSON summary and the Prometheus textfile; returns their paths, or None when disabled"""
+    if not _state['enabled']:
+        return None
+    directory = _state['directory']
+    os.makedirs(directory, exist_ok=True)
+    data = summary()
+    summary_path = os.path.join(directory, SUMMARY_NAME)
+    prom_path = os.path.join(directory, PROM_NAME)
+    _write_atomic(summary_path, json.dumps(data, indent=2, ensure_ascii=False))
+    _write_atomic(prom_path, prometheus(data))
+    logger.info(f"Run metrics written to {summary_path} and {prom_path}")
+    return summary_path, prom_path
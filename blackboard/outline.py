@@ -0,0 +1,141 @@
+# blackboard/outline.py
+
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+from .http_download import export_cookies
+
+logger = logging.getLogger(__name__)
+
+COURSE_URL_RE = re.compile(r'/ultra/courses/(_\d+_\d+)')
+PAGE_LIMIT = 200
+
+FOLDER = 'resource/x-bb-folder'
+# 内容类型 -> Ultra中打开该内容的路径
+CONTENT_PATHS = {
+    'resource/x-bb-file': 'outline/file/{id}',
+    'resource/x-bb-document': 'outline/edit/document/{id}',
+    'resource/x-bb-blankpage': 'outline/edit/document/{id}',
+}
+
+
+class OutlineClient:
+    """
+    Discover course content through the JSON endpoints the Ultra UI calls.
+
+    `get_json(url)` performs the request and returns the decoded JSON (or
+    None); it defaults to a cookie-authenticated requests session, and can be
+    replaced by a loader over recorded JSON fixtures.
+    """
+
+    def __init__(self, origin, get_json=None, session=None, timeout=10, workers=8):
+        self.origin = origin
+        self.timeout = timeout
+        self.workers = workers
+        self.session = session
+        self._get_json = get_json or self._session_get_json
+
+    @classmethod
+    def from_page(cls, page, course_url, timeout=10, workers=8):
+        """Build a client that shares the cookies of a logged-in ChromiumPage"""
+        session = requests.Session()
+        session.cookies.update(export_cookies(page))
+        session.headers['Accept'] = 'application/json'
+        parts = urlparse(course_url)
+        return cls(f"{parts.scheme}://{parts.netloc}", session=session, timeout=timeout, workers=workers)
+
+    def _session_get_json(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code != 200:
+            logger.debug(f"GET {url} -> {response.status_code}")
+            return None
+        return response.json()
+
+    def children(self, course_id, content_id=None):
+        """Return all children of a content folder (the course root if content_id is None), following pagination"""
+        if content_id is None:
+            url = f"/learn/api/public/v1/courses/{course_id}/contents?limit={PAGE_LIMIT}"
+        else:
+            url = f"/learn/api/public/v1/courses/{course_id}/contents/{content_id}/children?limit={PAGE_LIMIT}"
+        results = []
+        while url:
+            data = self._get_json(urljoin(self.origin, url))
+            if not data:
+                break
+            results.extend(data.get('results', []))
+            url = (data.get('paging') or {}).get('nextPage')
+        return results
+
+    def content_url(self, course_id, item):
+        """Return the Ultra URL of a content item, or None for unsupported types"""
+        handler = (item.get('contentHandler') or {}).get('id')
+        path = CONTENT_PATHS.get(handler)
+        if not path:
+            return None
+        return f"{self.origin}/ultra/courses/{course_id}/" + path.format(id=item['id'])
+
+    def _collect(self, course_id, folder, week):
+        """Collect (href, title, week) from a folder and its sub folders"""
+        links = []
+        for item in self.children(course_id, folder['id']):
+            if _is_folder(item):
+                links.extend(self._collect(course_id, item, week))
+                continue
+            href = self.content_url(course_id, item)
+            if href and item.get('title'):
+                links.append((href, item['title'], week))
+        return links
+
+    def discover(self, course_url, lectures_title='Lectures'):
+        """
+        Return (href, title, week) for every item of the course.
+
+        Week folders are the sub folders of the folder titled `lectures_title`
+        (or the top level folders when there is none); they are fetched
+        concurrently and returned in outline order.
+        """
+        all_content = []
+        for links in self.iter_discover(course_url, lectures_title):
+            all_content.extend(links)
+        return all_content
+
+    def iter_discover(self, course_url, lectures_title='Lectures'):
+        """
+        Like discover(), but yield the links week by week as they arrive.
+
+        Loose items of the lectures folder come first, then one list per week
+        in outline order; later weeks keep loading while the caller works.
+        """
+        match = COURSE_URL_RE.search(course_url)
+        if not match:
+            raise ValueError(f"Not a course URL: {course_url}")
+        course_id = match.group(1)
+
+        root = self.children(course_id)
+        lectures = next((item for item in root if _is_folder(item) and lectures_title in item.get('title', '')), None)
+        if lectures:
+            entries = self.children(course_id, lectures['id'])
+            loose = [(self.content_url(course_id, item), item.get('title'), lectures['title'])
+                     for item in entries if not _is_folder(item)]
+            loose = [link for link in loose if link[0] and link[1]]
+            if loose:
+                yield loose
+        else:
+            logger.info(f"No '{lectures_title}' folder found, using the top level folders")
+            entries = root
+        weeks = [item for item in entries if _is_folder(item)]
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            yield from pool.map(lambda week: self._collect(course_id, week, week['title']), weeks)
+
+    def close(self):
+        if self.session:
+            self.session.close()
+
+
+def _is_folder(item):
+    return (item.get('contentHandler') or {}).get('id') == FOLDER
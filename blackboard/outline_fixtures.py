@@ -0,0 +1,168 @@
+# blackboard/outline_fixtures.py
+"""
+Recorded JSON responses of the Ultra content endpoints, for checking OutlineClient offline.
+
+A fixture is one JSON file with the course URL, every response the client
+received (keyed by path and query, without the origin) and the expected
+(href, title, week) list. The expected links should not come from the
+code under test: benchmarks/record_fixtures.py derives them from its course
+model; for a live course pass a hand-checked list with --expected.
+
+    python -m blackboard.outline_fixtures record URL fixture.json --cookie BbRouter=... --expected links.json
+    python -m blackboard.outline_fixtures check blackboard/fixtures/*.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from urllib.parse import urlparse
+
+import requests
+
+from .outline import OutlineClient
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# 记录时把真实站点地址换成这个，fixture 里不留学校域名
+DEFAULT_ORIGIN = 'https://blackboard.example.com'
+
+
+def _request_key(url):
+    parts = urlparse(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+def fixture_get_json(responses):
+    """Return a `get_json(url)` for OutlineClient that answers from recorded responses"""
+    def get_json(url):
+        key = _request_key(url)
+        if key not in responses:
+            logger.debug(f"No recorded response for {key}")
+            return None
+        return responses[key]
+    return get_json
+
+
+def load(path, workers=1):
+    """Load a fixture; returns (client, course_url, lectures_title, expected links)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        fixture = json.load(f)
+    client = OutlineClient(fixture['origin'], get_json=fixture_get_json(fixture['responses']), workers=workers)
+    expected = [tuple(link) for link in fixture['expected']]
+    return client, fixture['course_url'], fixture['lectures_title'], expected
+
+
+def _rebase(url, origin):
+    return origin + _request_key(url)
+
+
+def record(client, course_url, path, lectures_title='Lectures', origin=DEFAULT_ORIGIN, expected=None):
+    """
+    Run discovery with `client` and save every response it received as a fixture at `path`.
+
+    `expected` is the list of (href, title, week) the course should yield,
+    worked out independently of OutlineClient. Without it the links found
+    while recording are saved and must be reviewed by hand. URLs in the
+    fixture use `origin` instead of the recorded site's. Returns the number
+    of expected links.
+    """
+    responses = {}
+    lock = threading.Lock()
+    get_json = client._get_json
+
+    def recording(url):
+        data = get_json(url)
+        if data is not None:
+            with lock:
+                responses[_request_key(url)] = data
+        return data
+
+    client._get_json = recording
+    try:
+        found = client.discover(course_url, lectures_title)
+    finally:
+        client._get_json = get_json
+
+    if expected is None:
+        logger.warning(f"No expected links given for {path}; saving the {len(found)} links found, review them by hand")
+        expected = found
+    elif list(map(tuple, expected)) != found:
+        logger.warning(f"Discovery found {len(found)} links, expected {len(expected)}; the fixture keeps the expected ones")
+    fixture = {
+        'origin': origin,
+        'course_url': _rebase(course_url, origin),
+        'lectures_title': lectures_title,
+        'responses': dict(sorted(responses.items())),
+        'expected': [[_rebase(href, origin), title, week] for href, title, week in expected],
+    }
+    tmp_path = str(path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    logger.info(f"Recorded {len(responses)} responses and {len(expected)} links to {path}")
+    return len(expected)
+
+
+def check(path, workers=4):
+    """Replay a fixture; returns a list of differences from the recorded links (empty if none)"""
+    client, course_url, lectures_title, expected = load(path, workers)
+    found = client.discover(course_url, lectures_title)
+    problems = []
+    if found != expected:
+        missing = [link for link in expected if link not in found]
+        extra = [link for link in found if link not in expected]
+        problems.append(f"{len(found)} links instead of {len(expected)}: missing {missing[:3]}, unexpected {extra[:3]}")
+        if not missing and not extra:
+            problems.append("links are in a different order")
+    return problems
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Record or check OutlineClient JSON fixtures")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help="record the responses of a live course")
+    record_parser.add_argument('course_url')
+    record_parser.add_argument('path')
+    record_parser.add_argument('--cookie', action='append', default=[], help="NAME=VALUE of the logged-in session")
+    record_parser.add_argument('--lectures-title', default='Lectures')
+    record_parser.add_argument('--origin', default=DEFAULT_ORIGIN)
+    record_parser.add_argument('--expected', help="JSON file with the hand-checked [href, title, week] list")
+    check_parser = commands.add_parser('check', help="replay fixtures and compare with the recorded links")
+    check_parser.add_argument('paths', nargs='*')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        session = requests.Session()
+        session.cookies.update(dict(cookie.split('=', 1) for cookie in args.cookie))
+        session.headers['Accept'] = 'application/json'
+        parts = urlparse(args.course_url)
+        client = OutlineClient(f"{parts.scheme}://{parts.netloc}", session=session)
+        expected = None
+        if args.expected:
+            with open(args.expected, 'r', encoding='utf-8') as f:
+                expected = json.load(f)
+        try:
+            record(client, args.course_url, args.path, args.lectures_title, args.origin, expected)
+        finally:
+            client.close()
+        return
+
+    paths = args.paths or sorted(os.path.join(FIXTURES_DIR, name) for name in os.listdir(FIXTURES_DIR)
+                                 if name.endswith('.json'))
+    failed = 0
+    for path in paths:
+        problems = check(path)
+        failed += bool(problems)
+        print(f"{'FAIL' if problems else 'ok'}  {path}")
+        for problem in problems:
+            print(f"      {problem}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# blackboard/pipeline.py
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# 通知下游阶段不会再有新任务
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    `handler(worker, value)` is a blocking function run on a thread, with
+    `worker` the index of the calling worker (0 .. workers-1). It returns
+    None, or `(stage_name, value)` to pass a value on to a later stage, or
+    a list of such pairs. If it raises, `on_error(value, error)` is called
+    (on the same thread) so the caller can record the value as failed.
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=None, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size or self.workers * 2
+        self.queue = None
+        self.processed = 0
+
+
+class Pipeline:
+    """
+    Stages connected by bounded asyncio queues.
+
+    A source (any iterable of batches, e.g. week by week discovery) feeds the
+    first stage. Each stage runs its own number of workers and can only pass
+    values forward, to any later stage. When a queue is full, the stage
+    putting into it waits, so slow conversion or indexing holds back
+    downloads and downloads hold back discovery instead of piling up items
+    in memory.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.by_name = {stage.name: stage for stage in self.stages}
+        self.first = {}
+
+    def run(self, batches):
+        """Run the pipeline over the batches of the first stage; returns {stage name: processed count}"""
+        return asyncio.run(self._run(batches))
+
+    async def _run(self, batches):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=sum(stage.workers for stage in self.stages) + 1,
+                                      thread_name_prefix='pipeline')
+        self.started = time.perf_counter()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+        progress = tqdm(desc="Pipeline", unit='item')
+
+        async def feed():
+            iterator = iter(batches)
+            while True:
+                # 发现阶段的下一批（例如下一周）在线程中获取，不阻塞事件循环
+                batch = await loop.run_in_executor(executor, next, iterator, _DONE)
+                if batch is _DONE:
+                    return
+                for value in batch:
+                    progress.total = (progress.total or 0) + 1
+                    await self.stages[0].queue.put(value)
+
+        async def worker(stage, index):
+            while True:
+                value = await stage.queue.get()
+                if value is _DONE:
+                    return
+                try:
+                    outputs = await loop.run_in_executor(executor, stage.handler, index, value)
+                except Exception as e:
+                    logger.error(f"Pipeline stage {stage.name} failed on {value}: {e}")
+                    outputs = None
+                    if stage.on_error:
+                        try:
+                            await loop.run_in_executor(executor, stage.on_error, value, e)
+                        except Exception as callback_error:
+                            # 回调出错不能让 worker 退出，否则队列无人消费，整个流水线挂起
+                            logger.error(f"Pipeline stage {stage.name} on_error callback failed for {value}: "
+                                         f"{callback_error}")
+                stage.processed += 1
+                if stage is self.stages[0]:
+                    progress.update(1)
+                self._mark_first(stage.name)
+                if outputs and isinstance(outputs, tuple):
+                    outputs = [outputs]
+                for target, output in outputs or []:
+                    await self.by_name[target].queue.put(output)
+
+        tasks = [[asyncio.ensure_future(worker(stage, i)) for i in range(stage.workers)] for stage in self.stages]
+        try:
+            await feed()
+            # 逐级关闭：某阶段之前的所有阶段结束后，它不会再收到新任务
+            for stage, workers in zip(self.stages, tasks):
+                for _ in workers:
+                    await stage.queue.put(_DONE)
+                await asyncio.gather(*workers)
+        except BaseException:
+            # 数据源或某个 worker 出错：取消其余 worker，不让它们在已关闭的循环里等待队列
+            pending = [task for workers in tasks for task in workers if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+        finally:
+            progress.close()
+            executor.shutdown(wait=True)
+        return {stage.name: stage.processed for stage in self.stages}
+
+    def _mark_first(self, name):
+        # 记录从开始到每个阶段完成第一个任务的时间（例如第一个文档进入索引）
+        if name in self.first:
+            return
+        self.first[name] = time.perf_counter() - self.started
+        metrics.observe(f'first_{name}', self.first[name])
+        logger.info(f"First {name} item finished after {self.first[name]:.1f}s")
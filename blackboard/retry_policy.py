@@ -0,0 +1,218 @@
+# blackboard/retry_policy.py
+
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadFailed(Exception):
+    """A download attempt finished without an error but did not produce a file"""
+
+
+class Throttled(Exception):
+    """The server answered with 429/503; `retry_after` is its hint in seconds, if any"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# 只有这些错误说明服务器本身出了问题，计入断路器；页面上没有文件之类的失败不算
+SERVER_ERRORS = (Throttled, TimeoutError, requests.Timeout, requests.ConnectionError)
+
+
+def is_server_error(error):
+    """True for throttling, connection, timeout and 5xx errors"""
+    if isinstance(error, SERVER_ERRORS):
+        return True
+    response = getattr(error, 'response', None)
+    return isinstance(error, requests.HTTPError) and response is not None and response.status_code >= 500
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter, configured per error class.
+
+    `rules` is a list of `(exception types, max attempts, base delay)`; the
+    first matching rule wins. The delay after the n-th failed attempt is
+    `min(max_delay, base * 2 ** (n - 1))` scaled by a random factor in [0.5, 1].
+    """
+
+    def __init__(self, rules, max_delay=60):
+        self.rules = rules
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls, config):
+        attempts = config['retry_times']
+        base = config['retry_backoff']
+        return cls([
+            (Throttled, attempts + 2, base * 4),
+            ((TimeoutError, requests.Timeout, requests.ConnectionError), attempts, base),
+            (DownloadFailed, attempts, base),
+            (Exception, min(attempts, 2), base),
+        ], max_delay=config['retry_max_delay'])
+
+    def delay(self, error, attempt):
+        """Seconds to wait before retrying after `attempt` failed attempts, or None to give up"""
+        for types, max_attempts, base in self.rules:
+            if isinstance(error, types):
+                if attempt >= max_attempts:
+                    return None
+                delay = min(self.max_delay, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1)
+                if isinstance(error, Throttled) and error.retry_after:
+                    delay = max(delay, error.retry_after)
+                return delay
+        return None
+
+
+class CircuitBreaker:
+    """
+    Pause all workers of a course when the server keeps failing.
+
+    After `threshold` consecutive server errors (or any throttling response)
+    the breaker opens and `wait()` blocks every caller for `cooldown`
+    seconds. One call is then let through while the others keep waiting;
+    success closes the breaker, failure opens it again with a doubled
+    cooldown. Errors that are not the server's fault (see
+    `is_server_error`) are ignored.
+    """
+
+    def __init__(self, name='', threshold=5, cooldown=60, max_cooldown=600):
+        self.name = name
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.state = 'closed'
+        self.open_until = 0
+        # 半开状态下试探调用的截止时间，过期未回报则放行下一个调用
+        self.probe_until = 0
+        self._cond = threading.Condition()
+
+    def wait(self):
+        """Block while the breaker is open or another call is probing it"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.state == 'closed':
+                    return
+                expired = self.open_until if self.state == 'open' else self.probe_until
+                if now >= expired:
+                    self.state = 'half_open'
+                    self.probe_until = now + self.cooldown
+                    return
+                self._cond.wait(expired - now)
+
+    def record_success(self):
+        with self._cond:
+            if self.state != 'closed':
+                logger.info(f"Circuit breaker {self.name} closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._cond.notify_all()
+
+    def release(self):
+        """
+        Report a call whose outcome says nothing about the server.
+
+        The breaker state and failure count are left alone; if the call was
+        the half-open probe, the next caller becomes the probe.
+        """
+        with self._cond:
+            if self.state == 'half_open':
+                self.probe_until = 0
+                self._cond.notify_all()
+
+    def record_failure(self, error=None):
+        if not is_server_error(error):
+            return
+        with self._cond:
+            self.failures += 1
+            if self.state == 'closed' and self.failures < self.threshold and not isinstance(error, Throttled):
+                return
+            cooldown = self.cooldown
+            if isinstance(error, Throttled) and error.retry_after:
+                cooldown = max(cooldown, error.retry_after)
+            self.state = 'open'
+            self.open_until = time.monotonic() + cooldown
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self.failures = 0
+            logger.warning(f"Circuit breaker {self.name} open for {cooldown:.0f}s after: {error}")
+            self._cond.notify_all()
+
+
+class FailureReport:
+    """Collect the items that failed after all retries"""
+
+    def __init__(self):
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def add(self, item, error, attempts):
+        with self._lock:
+            self.items[item[0]] = {'item': list(item), 'error': str(error), 'type': type(error).__name__, 'attempts': attempts}
+
+    def write(self, path):
+        with self._lock:
+            entries = list(self.items.values())
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        return path
+
+
+def with_retries(fn, policy, breaker=None, report=None, item_slice=slice(None), retry_falsy=True):
+    """
+    Wrap a download function with retries, backoff and the circuit breaker.
+
+    The wrapped function sleeps according to `policy` between attempts and
+    returns False once the policy gives up, recording the item
+    (`args[item_slice]`) in `report`. A falsy return counts as
+    `DownloadFailed` when `retry_falsy`, otherwise it is returned as is.
+    """
+    def wrapped(*args):
+        attempt = 0
+        while True:
+            if breaker:
+                breaker.wait()
+            attempt += 1
+            try:
+                result = fn(*args)
+                if not result:
+                    if not retry_falsy:
+                        # 这一项不能用这种方式下载，与服务器状态无关
+                        if breaker:
+                            breaker.release()
+                        return result
+                    raise DownloadFailed(f"no file from {args[item_slice][1]}")
+                if breaker:
+                    breaker.record_success()
+                return result
+            except Exception as e:
+                if breaker:
+                    # 服务器的错误计入断路器；其他失败不改变它的状态，只是不让试探调用悬而未决
+                    if is_server_error(e):
+                        breaker.record_failure(e)
+                    else:
+                        breaker.release()
+                delay = policy.delay(e, attempt)
+                if delay is None:
+                    metrics.count('gave_up')
+                    logger.error(f"Giving up on {args[item_slice][1]} after {attempt} attempts: {e}")
+                    if report is not None:
+                        report.add(tuple(args[item_slice]), e, attempt)
+                    return False
+                metrics.count('retries')
+                logger.info(f"Retrying {args[item_slice][1]} in {delay:.1f}s ({type(e).__name__}: {e})")
+                time.sleep(delay)
+    return wrapped
@@ -0,0 +1,265 @@
+# blackboard/strategies.py
+
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+
+from . import metrics
+from .waits import wait_until
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_NAME = '.strategies.json'
+
+# 菜单里的 "Download original file" 选项
+DOWNLOAD_OPTION = 'text:Download original file'
+
+# 内置策略：每一步是 [动作, 选择器, 第几个匹配元素]，'click' 只点击，'download' 点击并等待下载完成
+DEFAULT_STRATEGIES = {
+    'direct': [['download', 'xpath://button[@aria-label="Download"]', 0]],
+    'more_options': [
+        ['click', 'css=button[class*="MuiButtonBase"][class*="MuiIconButton"]', 0],
+        ['download', 'css=button[aria-label="Download"]', 0],
+    ],
+}
+
+# 内置策略都失败时逐个点击这些元素，寻找能打开下载菜单的那个
+PROBE_SELECTORS = [
+    # Material UI按钮
+    "[class*='MuiButtonBase'][class*='root']",
+    # 通过aria属性
+    "[aria-label*='download' i]",
+    # 通过title属性
+    "[title*='download' i]",
+    # 具有下载图标的按钮
+    "xpath://button[.//svg]",
+    # 更宽松的SVG路径匹配
+    "xpath://button[.//svg[.//path]]",
+    # 任何可能是下载按钮的元素
+    "[role='button']",
+    # 尝试定位父容器
+    "div[class*='makeStyles'] button",
+]
+
+# 下载开始后等待完成的最长时间（秒）
+DOWNLOAD_TIMEOUT = 60
+
+PAGE_TYPE_RE = re.compile(r'/outline/(?:edit/)?([a-z]+)/', re.IGNORECASE)
+# 只把像 pdf、pptx、mp4 这样的后缀当作扩展名，"Lecture 1.3" 之类的标题不算
+EXT_RE = re.compile(r'[a-z][a-z0-9]{0,4}')
+
+
+def _extension(name):
+    ext = os.path.splitext(name or '')[1].lower().lstrip('.')
+    return ext if EXT_RE.fullmatch(ext) else None
+
+
+def signature(url, title, file_name=None, content_type=None):
+    """
+    Key a page by its type (file, document, ...) and the extension of the content.
+
+    The extension comes from the resolved `file_name` or the `content_type`
+    when they are known (e.g. from the API), and from the title otherwise;
+    titles rarely carry one.
+    """
+    match = PAGE_TYPE_RE.search(url or '')
+    page_type = match.group(1).lower() if match else 'other'
+    ext = _extension(file_name)
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    # 下载接口常用的通用类型说明不了文件是什么
+    if not ext and content_type and content_type != 'application/octet-stream':
+        guessed = mimetypes.guess_extension(content_type) or ''
+        ext = guessed.lstrip('.') if EXT_RE.fullmatch(guessed.lstrip('.')) else None
+    ext = ext or _extension(title) or 'none'
+    return f'{page_type}:{ext}'
+
+
+class StrategyRegistry:
+    """
+    Remembers which click sequence downloaded each kind of page.
+
+    Strategies are stored per signature with their success and failure
+    counts; the best one is tried first, the built-in ones next, and
+    probing every candidate button is the last resort. The registry is a
+    small JSON file written atomically, so it carries over between runs.
+    """
+
+    def __init__(self, path=None):
+        self.path = str(path) if path else None
+        self.entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    @classmethod
+    def for_download_path(cls, download_path):
+        return cls(os.path.join(download_path, STRATEGIES_NAME))
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read strategy registry {self.path}: {e}")
+
+    def save(self):
+        """Write the registry if it changed (temp file + os.replace)"""
+        with self._lock:
+            if not self.path or not self.dirty:
+                return
+            data = json.dumps(self.entries, indent=2, ensure_ascii=False)
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def ordered(self, key):
+        """Return [(name, steps)] to try for `key`: learned winners first, then the built-in ones"""
+        with self._lock:
+            learned = dict(self.entries.get(key, {}))
+        ranked = sorted(learned.items(), key=lambda item: (item[1]['fails'] - item[1]['wins'], item[0]))
+        result = [(name, entry['steps']) for name, entry in ranked if entry['wins'] > entry['fails']]
+        names = {name for name, _ in result}
+        for name, steps in DEFAULT_STRATEGIES.items():
+            if name not in names:
+                result.append((name, steps))
+                names.add(name)
+        # 失败多于成功的学习结果放在最后
+        result.extend((name, entry['steps']) for name, entry in ranked if name not in names)
+        return result
+
+    def record(self, key, name, steps, ok):
+        with self._lock:
+            entry = self.entries.setdefault(key, {}).setdefault(name, {'steps': steps, 'wins': 0, 'fails': 0})
+            if ok:
+                entry['wins'] += 1
+            else:
+                # 页面改版后旧的胜者很快让位
+                entry['fails'] += 1
+                entry['wins'] //= 2
+            self.dirty = True
+
+
+# 进程内的默认注册表，configure 之后持久化到文件
+_default = {'registry': StrategyRegistry()}
+
+
+def configure(path=None):
+    """Use (and persist to) the registry file at `path`"""
+    _default['registry'] = StrategyRegistry(path)
+    return _default['registry']
+
+
+def save():
+    _default['registry'].save()
+
+
+def _element(page, selector, index, timeout):
+    if index == 0:
+        return page.ele(selector, timeout=timeout)
+    elements = page.eles(selector, timeout=timeout)
+    return elements[index] if index < len(elements) else None
+
+
+def wait_mission(mission, timeout=DOWNLOAD_TIMEOUT):
+    """
+    Wait for the download started by one click and return its file path.
+
+    Only this item's own download mission is watched, so tabs downloading
+    into the same week folder never claim each other's files. Returns False
+    if no download started, it failed, or it did not finish within `timeout`
+    (the download is then cancelled).
+    """
+    if not mission:
+        return False
+    if not wait_until(lambda: mission.is_done, timeout=timeout, interval=0.2, name='download complete'):
+        mission.cancel()
+        return False
+    if mission.state != 'completed' or not mission.final_path:
+        logger.debug("Download of %s ended as %s", mission.name, mission.state)
+        return False
+    return str(mission.final_path)
+
+
+def run_steps(page, steps, title, week_folder, timeout=5):
+    """Replay a click sequence; returns the downloaded path, or False if a step found nothing or nothing was downloaded"""
+    for action, selector, index in steps:
+        with metrics.span('find_button'):
+            element = _element(page, selector, index, timeout)
+        if not element:
+            return False
+        if action == 'click':
+            element.click()
+            continue
+        with metrics.span('transfer'):
+            mission = element.click.to_download(save_path=week_folder, rename=title, timeout=timeout)
+            return wait_mission(mission)
+    return False
+
+
+def probe(page, option_timeout=1):
+    """
+    Click every candidate element until the "Download original file" option appears.
+
+    Returns the steps that opened the menu, or None.
+    """
+    for selector in PROBE_SELECTORS:
+        try:
+            logger.debug("Trying to find download button with selector: %s", selector)
+            elements = page.eles(selector, timeout=0)
+            logger.debug("Found %d matching elements", len(elements))
+            for index, element in enumerate(elements):
+                # 尝试点击每个可能的按钮，检查点击后是否出现下载选项
+                element.click()
+                if wait_until(lambda: page.ele(DOWNLOAD_OPTION, timeout=0),
+                              timeout=option_timeout, name='download options'):
+                    logger.info("Found download option after click")
+                    return [['click', selector, index]]
+        except Exception as e:
+            logger.debug("Failed with selector %s: %s", selector, e)
+    logger.warning("Could not find download button with any selector")
+    return None
+
+
+def download(page, url, title, week_folder, registry=None, timeout=5, file_name=None, content_type=None):
+    """
+    Download the content shown on `page` using the best known strategy.
+
+    `file_name`/`content_type` are whatever is already known about the file
+    and only refine the registry key. Returns (path, strategy name) on
+    success and (False, None) otherwise.
+    """
+    if registry is None:
+        registry = _default['registry']
+    key = signature(url, title, file_name, content_type)
+    for attempt, (name, steps) in enumerate(registry.ordered(key)):
+        try:
+            # 页面在第一次尝试时已经渲染完，之后的策略不必等满超时
+            result = run_steps(page, steps, title, week_folder, timeout if attempt == 0 else 1)
+        except Exception as e:
+            logger.debug("Strategy %s failed for %s: %s", name, title, e)
+            result = False
+        registry.record(key, name, steps, bool(result))
+        if result:
+            return result, name
+
+    with metrics.span('probe'):
+        steps = probe(page)
+    if not steps:
+        return False, None
+    steps = steps + [['download', DOWNLOAD_OPTION, 0]]
+    try:
+        result = run_steps(page, steps[1:], title, week_folder, timeout)
+    except Exception as e:
+        logger.debug("Download option failed for %s: %s", title, e)
+        result = False
+    name = 'probe:' + ':'.join(str(part) for part in steps[0][1:])
+    registry.record(key, name, steps, bool(result))
+    return (result, name) if result else (False, None)
@@ -0,0 +1,89 @@
+# blackboard/waits.py
+
+import logging
+import os
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.1
+# 下载中的临时文件后缀
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.tmp')
+
+# 每类等待实际花费的时间，用于运行结束时汇总
+wait_times = defaultdict(list)
+
+
+def wait_until(condition, timeout=10, interval=POLL_INTERVAL, name='condition'):
+    """
+    Poll `condition` until it returns a truthy value or `timeout` expires.
+
+    Returns the truthy value, or None on timeout. The elapsed time is logged
+    and recorded in `wait_times[name]`.
+    """
+    start = time.perf_counter()
+    result = None
+    while True:
+        try:
+            result = condition()
+        except Exception as e:
+            logger.debug(f"Wait '{name}' check failed: {e}")
+            result = None
+        if result:
+            break
+        if time.perf_counter() - start >= timeout:
+            break
+        time.sleep(interval)
+
+    elapsed = time.perf_counter() - start
+    wait_times[name].append(elapsed)
+    if result:
+        logger.debug(f"Wait '{name}' took {elapsed:.2f}s")
+    else:
+        logger.debug(f"Wait '{name}' timed out after {elapsed:.2f}s")
+    return result
+
+
+def wait_report():
+    """Return {name: (count, total_seconds, max_seconds)} for all recorded waits"""
+    return {name: (len(times), sum(times), max(times)) for name, times in wait_times.items()}
+
+
+def wait_ele(page, selector, timeout=10, name=None):
+    """Wait until `selector` matches an element and return it"""
+    return wait_until(lambda: page.ele(selector, timeout=0), timeout=timeout, name=name or f"ele {selector}")
+
+
+def list_files(folder):
+    """Return the set of file names currently in `folder`"""
+    try:
+        return set(os.listdir(folder))
+    except FileNotFoundError:
+        return set()
+
+
+def wait_download_complete(folder, before, timeout=60, interval=0.2):
+    """
+    Wait for a new file in `folder` that is not a partial download and whose size has settled.
+
+    `before` is the set of names present before the download was started.
+    Returns the path of the finished file, or None on timeout.
+    """
+    sizes = {}
+
+    def finished():
+        for name in list_files(folder) - before:
+            if name.endswith(PARTIAL_SUFFIXES):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if sizes.get(name) == size:
+                return path
+            sizes[name] = size
+        return None
+
+    return wait_until(finished, timeout=timeout, interval=interval, name='download complete')
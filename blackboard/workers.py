@@ -0,0 +1,117 @@
+# blackboard/workers.py
+
+import logging
+import queue
+import threading
+
+from tqdm import tqdm
+
+from .browser import prepare_tab
+
+logger = logging.getLogger(__name__)
+
+
+_tab_lock = threading.Lock()
+
+
+def open_tab(page):
+    """Open a new tab in the logged-in browser session"""
+    # 标签页对象本身不能新建标签页，交给所属的浏览器
+    opener = page if hasattr(page, 'new_tab') else page.browser
+    with _tab_lock:
+        tab = opener.new_tab()
+        # 旧版本的DrissionPage返回的是tab id
+        if isinstance(tab, str):
+            tab = opener.get_tab(tab)
+    return prepare_tab(tab)
+
+
+def download_all(page, items, download_fn, workers=1, desc="Download progress", on_done=None, on_failed=None):
+    """
+    Download items with a pool of browser tabs.
+
+    Every worker owns one tab of the shared (already logged-in) browser and
+    takes `(url, title, week_folder)` items from a shared queue, calling
+    `download_fn(tab, url, title, week_folder)`. The first worker reuses
+    `page` itself, so `workers=1` is the plain sequential loop.
+
+    `on_done(item, result)` and `on_failed(item)` are called (serialised) as
+    each item finishes; an item whose `on_done` raises counts as failed.
+    Returns the list of items for which `download_fn` returned False or raised.
+    """
+    workers = max(1, min(int(workers), len(items) or 1))
+    failed = []
+    lock = threading.Lock()
+    progress = tqdm(total=len(items), desc=desc)
+
+    if workers == 1:
+        for item in items:
+            _record(item, _run_item(page, item, download_fn), failed, on_done, on_failed)
+            progress.update(1)
+        progress.close()
+        return failed
+
+    jobs = queue.Queue()
+    for item in items:
+        jobs.put(item)
+
+    # 在主线程里打开所有标签页，避免并发创建
+    tabs = [page] + [open_tab(page) for _ in range(workers - 1)]
+    logger.info(f"Downloading {len(items)} items with {workers} tabs")
+
+    def worker(tab):
+        while True:
+            try:
+                item = jobs.get_nowait()
+            except queue.Empty:
+                return
+            result = _run_item(tab, item, download_fn)
+            with lock:
+                _record(item, result, failed, on_done, on_failed)
+                progress.update(1)
+
+    threads = [threading.Thread(target=worker, args=(tab,), daemon=True) for tab in tabs]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        progress.close()
+        for tab in tabs[1:]:
+            try:
+                tab.close()
+            except Exception as e:
+                logger.debug(f"Failed to close tab: {e}")
+
+    # 保持与输入相同的顺序，方便查看
+    order = {id(item): i for i, item in enumerate(items)}
+    failed.sort(key=lambda item: order[id(item)])
+    return failed
+
+
+def _run_item(tab, item, download_fn):
+    url, title, week_folder = item
+    try:
+        return download_fn(tab, url, title, week_folder)
+    except Exception as e:
+        logger.error(f"Worker failed on {title}: {e}")
+        return False
+
+
+def _record(item, result, failed, on_done, on_failed):
+    # 回调出错不能结束工作线程，否则剩下的任务没人处理、进度条也走不完
+    if result and on_done:
+        try:
+            on_done(item, result)
+        except Exception as e:
+            logger.error(f"on_done failed for {item[1]}: {e}")
+            result = False
+    if result:
+        return
+    failed.append(item)
+    if on_failed:
+        try:
+            on_failed(item)
+        except Exception as e:
+            logger.error(f"on_failed failed for {item[1]}: {e}")
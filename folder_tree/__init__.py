@@ -1 +1,4 @@
-from .tree import print_tree
+
+from .tree import print_tree, iter_tree, TreeEvent
+from .writers import write_string, write_jsonl, write_xml
+from .summary import summarize_tree
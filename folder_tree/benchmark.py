@@ -0,0 +1,244 @@
+# folder_tree/benchmark.py
+"""
+对比基于 os.listdir 的递归实现与当前的 os.scandir 实现，
+以及有列目录延迟时顺序遍历与并行遍历（workers）的耗时。
+
+用法：python -m folder_tree.benchmark --entries 100000
+"""
+
+import os
+import time
+import fnmatch
+import shutil
+import argparse
+import tempfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+from .tree import print_tree, _Lister
+
+
+def make_tree(root, entries, fanout=20, files_per_dir=30):
+    """生成一个约有 entries 个条目的目录树（文件夹按 Week_N 风格命名）"""
+    created = 0
+    queue = [root]
+    while queue and created < entries:
+        current = queue.pop(0)
+        for i in range(files_per_dir):
+            if created >= entries:
+                break
+            with open(os.path.join(current, f'Lecture_{i}.pdf'), 'wb') as f:
+                f.write(b'x' * (i % 7))
+            created += 1
+        for i in range(fanout):
+            if created >= entries:
+                break
+            path = os.path.join(current, f'Week_{i}')
+            os.mkdir(path)
+            queue.append(path)
+            created += 1
+    return created
+
+
+@contextmanager
+def slow_listing(latency):
+    """让每次列目录额外等待 latency 秒"""
+    original = _Lister.entries
+
+    def entries(self, path):
+        time.sleep(latency)
+        return original(self, path)
+
+    _Lister.entries = entries
+    try:
+        yield
+    finally:
+        _Lister.entries = original
+
+
+def timed(func, repeat, **kwargs):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(**kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='folder_tree benchmark')
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--path', default=None, help='使用已有目录而不是生成临时目录')
+    parser.add_argument('--workers', type=int, default=8, help='并行遍历的线程数')
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='并行遍历对比中每次列目录附加的延迟（秒），模拟网络文件系统')
+    args = parser.parse_args()
+
+    root = args.path or tempfile.mkdtemp(prefix='folder_tree_bench_')
+    try:
+        if not args.path:
+            count = make_tree(root, args.entries)
+            print(f'生成了 {count} 个条目：{root}')
+        for output_format in ('string', 'json', 'xml'):
+            options = dict(path=root, max_depth=64, include_file_sizes=True,
+                           exclude_patterns=['*.pyc'], output_format=output_format)
+            old_time, old = timed(listdir_print_tree, args.repeat, **options)
+            new_time, new = timed(print_tree, args.repeat, **options)
+            if output_format == 'xml':
+                old = [ET.tostring(e) for e in old]
+                new = [ET.tostring(e) for e in new]
+            same = '相同' if old == new else '不同!'
+            print(f'{output_format:>6}: listdir {old_time:.3f}s  scandir {new_time:.3f}s  '
+                  f'加速 {old_time / new_time:.1f}x  输出{same}')
+
+        # 每次列目录都有延迟时，对比顺序遍历与并行遍历
+        options = dict(path=root, max_depth=64, exclude_patterns=['*.pyc'])
+        with slow_listing(args.latency):
+            serial_time, serial = timed(print_tree, 1, **options)
+            parallel_time, parallel = timed(print_tree, 1, workers=args.workers, **options)
+        same = '相同' if serial == parallel else '不同!'
+        print(f'延迟 {args.latency * 1000:.0f}ms: 顺序 {serial_time:.3f}s  {args.workers} 线程 {parallel_time:.3f}s  '
+              f'加速 {serial_time / parallel_time:.1f}x  输出{same}')
+    finally:
+        if not args.path:
+            shutil.rmtree(root)
+
+
+# 旧的递归实现，仅作为基准
+def listdir_print_tree(
+    path='.',
+    depth=0,
+    max_depth=2,
+    exclude=None,
+    exclude_patterns=None,
+    show_hidden=False,
+    include_file_sizes=False,
+    indent='    ',
+    prefix='|-- ',
+    output_format='string',
+):
+    """
+    打印文件夹目录树。
+
+    参数：
+    - path (str): 起始路径。
+    - depth (int): 当前递归深度。
+    - max_depth (int): 最大递归深度。
+    - exclude (list): 需要排除的文件或文件夹名称列表。
+    - exclude_patterns (list): 需要排除的文件或文件夹的通配符模式列表。
+    - show_hidden (bool): 是否显示隐藏文件和文件夹。
+    - include_file_sizes (bool): 是否显示文件大小。
+    - indent (str): 缩进符号。
+    - prefix (str): 前缀符号。
+    - output_format (str): 输出格式，'string'、'json' 或 'xml'。
+
+    返回：
+    - str 或 list 或 xml.etree.ElementTree.Element: 文件夹树的表示。
+    """
+    if exclude is None:
+        exclude = []
+    if exclude_patterns is None:
+        exclude_patterns = []
+
+    if depth > max_depth:
+        if output_format == 'string':
+            return ''
+        elif output_format == 'json':
+            return []
+        elif output_format == 'xml':
+            return []
+
+    tree_str = ''
+    tree_json = []
+    tree_xml = []
+
+    try:
+        items = os.listdir(path)
+    except PermissionError:
+        error_msg = indent * depth + prefix + '[权限不足]\n'
+        if output_format == 'string':
+            return error_msg
+        elif output_format == 'json':
+            return [{'name': '[权限不足]', 'type': 'error', 'children': []}]
+        elif output_format == 'xml':
+            error_element = ET.Element('error', name='[权限不足]')
+            return [error_element]
+
+    # 排序，先文件夹后文件
+    items.sort(key=lambda x: (not os.path.isdir(os.path.join(path, x)), x.lower()))
+
+    for item in items:
+        item_path = os.path.join(path, item)
+        is_dir = os.path.isdir(item_path)
+
+        # 处理隐藏文件和文件夹
+        if not show_hidden and item.startswith('.'):
+            continue
+
+        # 处理名称排除列表
+        if item in exclude:
+            continue
+
+        # 处理通配符模式排除
+        if any(fnmatch.fnmatch(item, pattern) for pattern in exclude_patterns):
+            continue
+
+        display_item = item
+
+        # 添加文件大小信息
+        if include_file_sizes and os.path.isfile(item_path):
+            size = os.path.getsize(item_path)
+            display_item += f' ({size} bytes)'
+
+        # 构建树结构
+        if output_format == 'string':
+            tree_str += indent * depth + prefix + display_item + '\n'
+        elif output_format == 'json':
+            node = {
+                'name': display_item,
+                'type': 'directory' if is_dir else 'file',
+                'children': []
+            }
+        elif output_format == 'xml':
+            node = ET.Element('directory' if is_dir else 'file', name=display_item)
+
+        # 递归处理子目录
+        if is_dir:
+            child = listdir_print_tree(
+                path=item_path,
+                depth=depth + 1,
+                max_depth=max_depth,
+                exclude=exclude,
+                exclude_patterns=exclude_patterns,
+                show_hidden=show_hidden,
+                include_file_sizes=include_file_sizes,
+                indent=indent,
+                prefix=prefix,
+                output_format=output_format
+            )
+
+            if output_format == 'string':
+                tree_str += child
+            elif output_format == 'json':
+                node['children'] = child
+            elif output_format == 'xml':
+                node.extend(child)
+
+        if output_format == 'json':
+            tree_json.append(node)
+        elif output_format == 'xml':
+            tree_xml.append(node)
+
+    if output_format == 'string':
+        return tree_str
+    elif output_format == 'json':
+        return tree_json
+    elif output_format == 'xml':
+        return tree_xml
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# folder_tree/cache.py
+
+import os
+import json
+import time
+import hashlib
+import xml.etree.ElementTree as ET
+
+CACHE_VERSION = 1
+# mtime 距扫描时间太近的目录不可信（同一时间粒度内可能还有修改），下次重新扫描
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+def snapshot_path(cache_dir, root, lister, kind='tree', options=None):
+    """根据根路径、过滤选项（以及输出选项）生成快照文件路径"""
+    key = json.dumps([
+        options,
+        os.path.abspath(root),
+        sorted(lister.exclude),
+        list(lister.exclude_patterns),
+        lister.show_hidden,
+        lister.include_file_sizes,
+    ], sort_keys=True)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{kind}-{digest}.json')
+
+
+class SnapshotLister:
+    """
+    带磁盘快照的 _Lister：目录的 mtime 未变化时直接返回上次的列举结果。
+
+    目录的 mtime 只在增删、重命名条目时变化，所以 include_file_sizes 显示的
+    文件大小只在所在目录变化时刷新。
+    """
+
+    def __init__(self, lister, cache_dir, root):
+        self.lister = lister
+        self.cache_dir = cache_dir
+        self.root = root
+        self.path = snapshot_path(cache_dir, root, lister)
+        self.dirs = None
+        self.visited = {}
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        # 第一次列目录时才读取快照，OutputCache 命中时不需要读取
+        self.dirs = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.dirs = data['dirs']
+
+    def scan(self, path):
+        """与 _Lister.scan 相同，但优先使用快照"""
+        if self.dirs is None:
+            self._load()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        cached = self.dirs.get(path)
+        if mtime is not None and cached is not None and cached[0] == mtime:
+            self.hits += 1
+            self.visited[path] = cached
+            # 与 os.path.join 相同，但快得多
+            base = path if path.endswith(os.sep) else path + os.sep
+            return [(display_item, is_dir, base + name) for display_item, is_dir, name in cached[1]]
+
+        self.misses += 1
+        entries = self.lister.scan(path)
+        if mtime is not None and time.time_ns() - mtime < RACY_WINDOW_NS:
+            mtime = None
+        self.visited[path] = [mtime, [(display_item, is_dir, os.path.basename(item_path))
+                                      for display_item, is_dir, item_path in entries]]
+        self.changed = True
+        return entries
+
+    def save(self):
+        """写回快照（本次未遍历且已不存在的目录被删除），原子替换快照文件"""
+        if self.dirs is None:
+            return
+        dirs = self.visited
+        for path, cached in self.dirs.items():
+            # 例如 max_depth 较小时没有遍历到的深层目录
+            if path not in dirs and os.path.isdir(path):
+                dirs[path] = cached
+        if not self.changed and len(dirs) == len(self.dirs):
+            return
+        _write_json(self.path, {'version': CACHE_VERSION, 'dirs': dirs})
+
+
+class OutputCache:
+    """
+    print_tree 结果的快照，记录生成时遍历到的每个目录的 mtime。
+
+    这些目录的 mtime 都没变时，目录树的结构和内容也没变，直接返回上次的结果，
+    只需对每个目录做一次 stat。
+    """
+
+    def __init__(self, snapshot, options):
+        self.snapshot = snapshot
+        self.output_format = options['output_format']
+        self.path = snapshot_path(snapshot.cache_dir, snapshot.root, snapshot.lister, 'output', options)
+
+    def load(self):
+        """返回上次的结果；任何目录有变化时返回 None"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != CACHE_VERSION:
+            return None
+        for path, mtime in data['dirs'].items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return None
+            except OSError:
+                return None
+        result = data['result']
+        if self.output_format == 'xml':
+            result = [ET.fromstring(element) for element in result]
+        return result
+
+    def store(self, result):
+        mtimes = {path: cached[0] for path, cached in self.snapshot.visited.items()}
+        # 没有列出任何目录，或有目录刚被修改时不保存
+        if not mtimes or None in mtimes.values():
+            return
+        if self.output_format == 'xml':
+            result = [ET.tostring(element, encoding='unicode') for element in result]
+        _write_json(self.path, {'version': CACHE_VERSION, 'dirs': mtimes, 'result': result})
+
+
+def _write_json(path, data):
+    # 先写临时文件再原子替换
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
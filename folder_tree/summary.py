@@ -0,0 +1,243 @@
+# folder_tree/summary.py
+
+import os
+from collections import Counter, deque
+
+from .tree import _Lister, _is_file, PERMISSION_DENIED
+
+UNITS = ('chars', 'tokens')
+# 没有分词器时按每 4 个字符约 1 个 token 估算
+CHARS_PER_TOKEN = 4
+# 摘要中最多列出的扩展名个数，其余合并为 "N other"
+MAX_EXTENSIONS = 3
+SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
+class _Node:
+    """一个文件夹及其子树的统计信息"""
+
+    __slots__ = ('name', 'depth', 'dirs', 'files', 'file_count', 'dir_count', 'size', 'extensions', 'error')
+
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.dirs = []
+        self.files = []  # [(显示名称, 大小, 扩展名)]
+        self.file_count = 0
+        self.dir_count = 0
+        self.size = 0
+        self.extensions = Counter()
+        self.error = False
+
+
+def format_size(size):
+    """把字节数格式化为 "180 MB" 这样的形式"""
+    value = float(size)
+    for unit in SIZE_UNITS:
+        if value < 1024 or unit == SIZE_UNITS[-1]:
+            break
+        value /= 1024
+    if unit == 'B':
+        return f'{size} B'
+    return f'{value:.0f} {unit}' if value >= 10 else f'{value:.1f} {unit}'
+
+
+def describe(file_count, dir_count, size, extensions):
+    """
+    生成子树摘要，例如 "(23 pdf, 4 pptx, 180 MB)"。
+
+    参数：
+    - file_count (int): 文件总数。
+    - dir_count (int): 文件夹总数。
+    - size (int): 文件总大小（字节）。
+    - extensions (Counter): 扩展名 -> 文件个数。
+    """
+    if not file_count and not dir_count:
+        return '(empty)'
+    parts = []
+    if dir_count:
+        parts.append(f'{dir_count} folders' if dir_count > 1 else '1 folder')
+    shown = 0
+    for ext, count in sorted(extensions.items(), key=lambda item: (-item[1], item[0]))[:MAX_EXTENSIONS]:
+        parts.append(f'{count} {ext or "no ext"}')
+        shown += count
+    if file_count > shown:
+        parts.append(f'{file_count - shown} other')
+    if file_count:
+        parts.append(format_size(size))
+    return '(' + ', '.join(parts) + ')'
+
+
+def _extension(name):
+    ext = os.path.splitext(name)[1]
+    return ext[1:].lower()
+
+
+def _build(path, lister, include_file_sizes):
+    """
+    一次遍历收集整棵树，返回根节点。
+
+    先按前序记录所有文件夹，再逆序把子树统计合并到父节点，整体是线性的。
+    """
+    root = _Node(os.path.basename(os.path.abspath(path)) or path, -1)
+    order = []
+    stack = [(root, path)]
+    while stack:
+        node, node_path = stack.pop()
+        order.append(node)
+        try:
+            entries = lister.entries(node_path)
+        except PermissionError:
+            node.error = True
+            continue
+        children = []
+        for entry, is_dir in entries:
+            if is_dir:
+                child = _Node(entry.name, node.depth + 1)
+                node.dirs.append(child)
+                # 不跟随文件夹符号链接，避免循环
+                if not entry.is_symlink():
+                    children.append((child, entry.path))
+                continue
+            try:
+                size = entry.stat().st_size if _is_file(entry) else 0
+            except OSError:
+                size = 0
+            display_item = entry.name
+            if include_file_sizes:
+                display_item += f' ({size} bytes)'
+            ext = _extension(entry.name)
+            node.files.append((display_item, size, ext))
+            node.file_count += 1
+            node.size += size
+            node.extensions[ext] += 1
+        # 逆序入栈，使前序与输出顺序一致
+        stack.extend(reversed(children))
+
+    for node in reversed(order):
+        for child in node.dirs:
+            node.file_count += child.file_count
+            node.dir_count += child.dir_count + 1
+            node.size += child.size
+            node.extensions.update(child.extensions)
+    return root
+
+
+def summarize_tree(
+    path='.',
+    budget=4000,
+    unit='chars',
+    max_depth=None,
+    exclude=None,
+    exclude_patterns=None,
+    show_hidden=False,
+    include_file_sizes=False,
+    indent='    ',
+    prefix='|-- ',
+):
+    """
+    在给定预算内输出文件夹目录树，放不下的子树折叠为一行摘要。
+
+    例如 "|-- Week_7/ (23 pdf, 4 pptx, 180 MB)"。按层从浅到深展开文件夹：
+    能完整展开就完整展开；否则只列出子文件夹，并把文件合并为一行摘要；
+    再放不下就保持折叠。统计只遍历一次，整体与条目数成线性关系。
+
+    参数：
+    - path (str): 起始路径。
+    - budget (int): 输出长度预算。
+    - unit (str): 预算单位，'chars'（字符）或 'tokens'（按 4 个字符约 1 个 token 估算）。
+    - max_depth (int): 最多展开的深度，None 表示不限制（统计总是覆盖整棵子树）。
+    - exclude (list): 需要排除的文件或文件夹名称列表。
+    - exclude_patterns (list): 需要排除的文件或文件夹的通配符模式列表。
+    - show_hidden (bool): 是否显示隐藏文件和文件夹。
+    - include_file_sizes (bool): 是否显示文件大小。
+    - indent (str): 缩进符号。
+    - prefix (str): 前缀符号。
+
+    返回：
+    - str: 文件夹树的表示（与 print_tree 的字符串格式相同）。
+    """
+    if unit not in UNITS:
+        raise ValueError(f'unit must be one of {UNITS}')
+    if unit == 'chars':
+        measure = len
+    else:
+        def measure(line):
+            return -(-len(line) // CHARS_PER_TOKEN)
+
+    lister = _Lister(exclude or [], exclude_patterns or [], show_hidden, include_file_sizes)
+    root = _build(path, lister, include_file_sizes)
+
+    def line(node_depth, text):
+        return indent * node_depth + prefix + text + '\n'
+
+    def collapsed(node):
+        if node.error:
+            return line(node.depth, f'{node.name}/ ({PERMISSION_DENIED})')
+        return line(node.depth, f'{node.name}/ ' + describe(node.file_count, node.dir_count, node.size, node.extensions))
+
+    def files_summary(node):
+        extensions = Counter(ext for _, _, ext in node.files)
+        size = sum(size for _, size, _ in node.files)
+        return line(node.depth + 1, describe(len(node.files), 0, size, extensions))
+
+    # 每个文件夹的状态：'full' 完整展开，'dirs' 文件合并为摘要，缺省为折叠
+    state = {}
+    cost = {}
+
+    def collapsed_cost(node):
+        value = cost.get(id(node))
+        if value is None:
+            value = cost[id(node)] = measure(collapsed(node))
+        return value
+
+    if root.error:
+        return line(0, PERMISSION_DENIED)
+
+    # 根节点没有自己的行，折叠时只输出一行摘要；无权限的文件夹保持折叠
+    used = collapsed_cost(root)
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        if node.error:
+            continue
+        if max_depth is not None and node.depth >= max_depth:
+            continue
+        own = measure(line(node.depth, node.name)) if node is not root else 0
+        base = own - collapsed_cost(node) + sum(collapsed_cost(child) for child in node.dirs)
+        full = base + sum(measure(line(node.depth + 1, name)) for name, _, _ in node.files)
+        if used + full <= budget:
+            state[id(node)] = 'full'
+            used += full
+        else:
+            partial = base + (measure(files_summary(node)) if node.files else 0)
+            if used + partial > budget:
+                continue
+            state[id(node)] = 'dirs'
+            used += partial
+        queue.extend(node.dirs)
+
+    if id(root) not in state:
+        return collapsed(root)
+
+    parts = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        # 文件行以字符串形式入栈
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        mode = state.get(id(node))
+        if node is not root:
+            if mode is None:
+                parts.append(collapsed(node))
+                continue
+            parts.append(line(node.depth, node.name))
+        # 先文件夹后文件
+        if mode == 'full':
+            stack.extend(line(node.depth + 1, name) for name, _, _ in reversed(node.files))
+        elif node.files:
+            stack.append(files_summary(node))
+        stack.extend(reversed(node.dirs))
+    return ''.join(parts)
@@ -1,9 +1,198 @@
 # folder_tree/tree.py
 
 import os
+import re
 import fnmatch
 import json
 import xml.etree.ElementTree as ET
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import SnapshotLister, OutputCache
+
+FORMATS = ('string', 'json', 'xml')
+PERMISSION_DENIED = '[权限不足]'
+
+
+class _Lister:
+    """列出单个目录：一次 os.scandir，排序并过滤，复用 DirEntry 缓存的类型信息。"""
+
+    def __init__(self, exclude, exclude_patterns, show_hidden, include_file_sizes):
+        self.exclude = set(exclude)
+        self.exclude_patterns = list(exclude_patterns)
+        # 与 fnmatch.fnmatch 相同的语义，但只编译一次
+        self.patterns = [re.compile(fnmatch.translate(os.path.normcase(p))).match for p in exclude_patterns]
+        self.show_hidden = show_hidden
+        self.include_file_sizes = include_file_sizes
+
+    def entries(self, path):
+        """
+        返回过滤后的 [(DirEntry, 是否文件夹)]，先文件夹后文件。
+
+        无权限时抛出 PermissionError。
+        """
+        with os.scandir(path) as it:
+            entries = [(entry, _is_dir(entry)) for entry in it]
+        # 排序，先文件夹后文件
+        entries.sort(key=lambda item: (not item[1], item[0].name.lower()))
+
+        result = []
+        for entry, is_dir in entries:
+            name = entry.name
+            # 处理隐藏文件和文件夹
+            if not self.show_hidden and name.startswith('.'):
+                continue
+            # 处理名称排除列表
+            if name in self.exclude:
+                continue
+            # 处理通配符模式排除
+            if self.patterns:
+                normalized = os.path.normcase(name)
+                if any(match(normalized) for match in self.patterns):
+                    continue
+            result.append((entry, is_dir))
+        return result
+
+    def scan(self, path):
+        """
+        返回 [(显示名称, 是否文件夹, 完整路径)]，先文件夹后文件。
+
+        无权限时抛出 PermissionError。
+        """
+        result = []
+        for entry, is_dir in self.entries(path):
+            display_item = entry.name
+            # 添加文件大小信息
+            if self.include_file_sizes and _is_file(entry):
+                display_item += f' ({entry.stat().st_size} bytes)'
+            result.append((display_item, is_dir, entry.path))
+        return result
+
+
+def _is_dir(entry):
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _is_file(entry):
+    try:
+        return entry.is_file()
+    except OSError:
+        return False
+
+
+def _error_node(output_format):
+    if output_format == 'json':
+        return {'name': PERMISSION_DENIED, 'type': 'error', 'children': []}
+    return ET.Element('error', name=PERMISSION_DENIED)
+
+
+class TreeEvent(NamedTuple):
+    """
+    iter_tree 产生的事件。
+
+    - event: 'node'（一个文件、文件夹或错误节点）或 'leave'（文件夹的子节点已全部产生）。
+    - depth: 深度，与 print_tree 的缩进层级一致。
+    - name: 显示名称（可能带文件大小）。
+    - type: 'directory'、'file' 或 'error'。
+    - path: 完整路径。
+    """
+    event: str
+    depth: int
+    name: str
+    type: str
+    path: str
+
+
+def _make_lister(path, exclude, exclude_patterns, show_hidden, include_file_sizes, cache_dir):
+    lister = _Lister(exclude or [], exclude_patterns or [], show_hidden, include_file_sizes)
+    if cache_dir is not None:
+        lister = SnapshotLister(lister, cache_dir, path)
+    return lister
+
+
+def _walk(lister, path, depth, max_depth, workers):
+    """用 lister 遍历目录树，产生 TreeEvent"""
+    if depth > max_depth:
+        return
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def prefetch(entries, level):
+        # 提前提交 entries 中各子文件夹的列举任务，返回 {路径: Future}
+        if pool is None or level + 1 > max_depth:
+            return {}
+        return {item_path: pool.submit(lister.scan, item_path)
+                for _, is_dir, item_path in entries if is_dir}
+
+    def listing(pending, item_path):
+        future = pending.pop(item_path, None)
+        return future.result() if future is not None else lister.scan(item_path)
+
+    try:
+        try:
+            entries = lister.scan(path)
+        except PermissionError:
+            yield TreeEvent('node', depth, PERMISSION_DENIED, 'error', path)
+            return
+
+        # 用显式栈代替递归，每层保存 (条目迭代器, 深度, 所在文件夹, 预取的子文件夹列表)
+        stack = [(iter(entries), depth, None, prefetch(entries, depth))]
+        while stack:
+            items, level, parent, pending = stack[-1]
+            item = next(items, None)
+            if item is None:
+                stack.pop()
+                if parent is not None:
+                    yield TreeEvent('leave', level - 1, parent[0], 'directory', parent[2])
+                continue
+            display_item, is_dir, item_path = item
+            yield TreeEvent('node', level, display_item, 'directory' if is_dir else 'file', item_path)
+            if not is_dir:
+                continue
+
+            # 处理子目录，超过最大深度的目录不再列出
+            child_entries = []
+            if level + 1 <= max_depth:
+                try:
+                    child_entries = listing(pending, item_path)
+                except PermissionError:
+                    yield TreeEvent('node', level + 1, PERMISSION_DENIED, 'error', item_path)
+            stack.append((iter(child_entries), level + 1, item, prefetch(child_entries, level + 1)))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_tree(
+    path='.',
+    depth=0,
+    max_depth=2,
+    exclude=None,
+    exclude_patterns=None,
+    show_hidden=False,
+    include_file_sizes=False,
+    workers=1,
+    cache_dir=None,
+):
+    """
+    边遍历边产生 TreeEvent，内存占用与目录树大小无关。
+
+    参数与 print_tree 相同。每个文件夹节点之后是它的子节点，然后是一个
+    'leave' 事件；没有权限的文件夹下面是一个 type 为 'error' 的节点。
+
+    workers > 1 时用线程池并行列出同一文件夹下的各个子文件夹（适合网络
+    文件系统），输出顺序不变；被排除的文件夹不会被列出。
+
+    指定 cache_dir 时在其中保存目录快照，下次只重新列出 mtime 变化的目录。
+    """
+    lister = _make_lister(path, exclude, exclude_patterns, show_hidden, include_file_sizes, cache_dir)
+    yield from _walk(lister, path, depth, max_depth, workers)
+    # 只有完整遍历后才写回快照
+    if cache_dir is not None:
+        lister.save()
+
 
 def print_tree(
     path='.',
@@ -16,6 +205,8 @@ def print_tree(
     indent='    ',
     prefix='|-- ',
     output_format='string',
+    workers=1,
+    cache_dir=None,
 ):
     """
     打印文件夹目录树。
@@ -31,107 +222,55 @@ def print_tree(
     - indent (str): 缩进符号。
     - prefix (str): 前缀符号。
     - output_format (str): 输出格式，'string'、'json' 或 'xml'。
+    - workers (int): 并行列出文件夹的线程数，1 表示顺序遍历。
+    - cache_dir (str): 目录快照的保存位置，None 表示不使用快照。
+      所有目录的 mtime 都没有变化时直接返回上次的结果，否则只重新列出变化的目录。
 
     返回：
     - str 或 list 或 xml.etree.ElementTree.Element: 文件夹树的表示。
     """
-    if exclude is None:
-        exclude = []
-    if exclude_patterns is None:
-        exclude_patterns = []
+    if output_format not in FORMATS:
+        return None
 
-    if depth > max_depth:
-        if output_format == 'string':
-            return ''
-        elif output_format == 'json':
-            return []
-        elif output_format == 'xml':
-            return []
+    lister = _make_lister(path, exclude, exclude_patterns, show_hidden, include_file_sizes, cache_dir)
+    outputs = None
+    if cache_dir is not None:
+        outputs = OutputCache(lister, dict(depth=depth, max_depth=max_depth, indent=indent,
+                                           prefix=prefix, output_format=output_format))
+        cached = outputs.load()
+        if cached is not None:
+            return cached
 
-    tree_str = ''
-    tree_json = []
-    tree_xml = []
+    events = _walk(lister, path, depth, max_depth, workers)
+    if output_format == 'string':
+        result = ''.join(indent * e.depth + prefix + e.name + '\n' for e in events if e.event == 'node')
+    else:
+        result = _build_nodes(events, output_format)
 
-    try:
-        items = os.listdir(path)
-    except PermissionError:
-        error_msg = indent * depth + prefix + '[权限不足]\n'
-        if output_format == 'string':
-            return error_msg
-        elif output_format == 'json':
-            return [{'name': '[权限不足]', 'type': 'error', 'children': []}]
-        elif output_format == 'xml':
-            error_element = ET.Element('error', name='[权限不足]')
-            return [error_element]
-
-    # 排序，先文件夹后文件
-    items.sort(key=lambda x: (not os.path.isdir(os.path.join(path, x)), x.lower()))
-
-    for item in items:
-        item_path = os.path.join(path, item)
-        is_dir = os.path.isdir(item_path)
-
-        # 处理隐藏文件和文件夹
-        if not show_hidden and item.startswith('.'):
-            continue
+    if outputs is not None:
+        lister.save()
+        outputs.store(result)
+    return result
 
-        # 处理名称排除列表
-        if item in exclude:
-            continue
 
-        # 处理通配符模式排除
-        if any(fnmatch.fnmatch(item, pattern) for pattern in exclude_patterns):
+def _build_nodes(events, output_format):
+    # 构建树结构，栈顶是当前文件夹的子节点容器
+    root = []
+    stack = [root]
+    for e in events:
+        if e.event == 'leave':
+            stack.pop()
+            continue
+        if e.type == 'error':
+            stack[-1].append(_error_node(output_format))
             continue
-
-        display_item = item
-
-        # 添加文件大小信息
-        if include_file_sizes and os.path.isfile(item_path):
-            size = os.path.getsize(item_path)
-            display_item += f' ({size} bytes)'
-
-        # 构建树结构
-        if output_format == 'string':
-            tree_str += indent * depth + prefix + display_item + '\n'
-        elif output_format == 'json':
-            node = {
-                'name': display_item,
-                'type': 'directory' if is_dir else 'file',
-                'children': []
-            }
-        elif output_format == 'xml':
-            node = ET.Element('directory' if is_dir else 'file', name=display_item)
-
-        # 递归处理子目录
-        if is_dir:
-            child = print_tree(
-                path=item_path,
-                depth=depth + 1,
-                max_depth=max_depth,
-                exclude=exclude,
-                exclude_patterns=exclude_patterns,
-                show_hidden=show_hidden,
-                include_file_sizes=include_file_sizes,
-                indent=indent,
-                prefix=prefix,
-                output_format=output_format
-            )
-
-            if output_format == 'string':
-                tree_str += child
-            elif output_format == 'json':
-                node['children'] = child
-            elif output_format == 'xml':
-                node.extend(child)
-
         if output_format == 'json':
-            tree_json.append(node)
-        elif output_format == 'xml':
-            tree_xml.append(node)
-
-    if output_format == 'string':
-        return tree_str
-    elif output_format == 'json':
-        return tree_json
-    elif output_format == 'xml':
-        return tree_xml
+            node = {'name': e.name, 'type': e.type, 'children': []}
+            children = node['children']
+        else:
+            node = ET.Element(e.type, name=e.name)
+            children = node
+        stack[-1].append(node)
+        if e.type == 'directory':
+            stack.append(children)
+    return root
@@ -0,0 +1,57 @@
+# folder_tree/writers.py
+
+import json
+from xml.sax.saxutils import XMLGenerator
+
+from .tree import iter_tree
+
+
+def write_string(fileobj, indent='    ', prefix='|-- ', **options):
+    """
+    把目录树以文本形式逐行写入 fileobj，返回写入的行数。
+
+    其余参数与 iter_tree 相同。
+    """
+    count = 0
+    for e in iter_tree(**options):
+        if e.event == 'node':
+            fileobj.write(indent * e.depth + prefix + e.name + '\n')
+            count += 1
+    return count
+
+
+def write_jsonl(fileobj, **options):
+    """
+    每个节点写一行 JSON：{"depth", "name", "type", "path"}，返回写入的行数。
+    """
+    count = 0
+    for e in iter_tree(**options):
+        if e.event == 'node':
+            fileobj.write(json.dumps(
+                {'depth': e.depth, 'name': e.name, 'type': e.type, 'path': e.path},
+                ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def write_xml(fileobj, root_tag='root', encoding='utf-8', **options):
+    """
+    增量地把目录树写成 XML（结构与 print_tree 的 xml 输出相同），返回节点数。
+
+    fileobj 是文本文件对象；文件夹在其子节点写完后才闭合。
+    """
+    writer = XMLGenerator(fileobj, encoding=encoding, short_empty_elements=True)
+    writer.startDocument()
+    writer.startElement(root_tag, {})
+    count = 0
+    for e in iter_tree(**options):
+        if e.event == 'leave':
+            writer.endElement('directory')
+            continue
+        count += 1
+        writer.startElement(e.type, {'name': e.name})
+        if e.type != 'directory':
+            writer.endElement(e.type)
+    writer.endElement(root_tag)
+    writer.endDocument()
+    return count
@@ -0,0 +1,5 @@
+
+from .convert import Converter, convert_file, read_front_matter
+from .index import VectorIndex, HashingEmbedder, make_embedder, chunk_markdown
+from .bm25 import BM25Index
+from .retrieval import Retriever
@@ -0,0 +1,248 @@
+# knowledge_base/bm25.py
+
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from .index import tokenize
+
+logger = logging.getLogger(__name__)
+
+MERGE_THRESHOLD = 5000
+
+
+class BM25Index:
+    """
+    BM25 inverted index over the rows of a `VectorIndex`.
+
+    The main segment is stored as flat arrays read with `np.memmap`:
+    `postings.i32` (row ids) and `tf.u16` (term frequencies) grouped by
+    term, `doclen.u32` (tokens per row), plus `lexicon.json` mapping each
+    term to its `[offset, length]` in the posting arrays. Rows added since
+    the last merge live in a small delta segment (`delta.jsonl`) and are
+    folded into the main segment by `merge()`.
+
+    All five files belong to one generation directory (`gen-<n>`) named by
+    `CURRENT`. A merge writes the next generation and then replaces
+    `CURRENT`, so a crash leaves either the old or the new generation whole.
+    """
+
+    def __init__(self, root, k1=1.5, b=0.75):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.generation = 0
+        current = self.root / 'CURRENT'
+        if current.exists():
+            self.generation = int(current.read_text(encoding='utf-8').strip())
+        self._open_main()
+        self._load_delta()
+        self._remove_stale()
+
+    @property
+    def dir(self):
+        """Directory of the current generation (the root itself before the first merge)"""
+        return self.root / f'gen-{self.generation}' if self.generation else self.root
+
+    def _open_main(self):
+        lexicon = self.dir / 'lexicon.json'
+        if lexicon.exists():
+            with open(lexicon, 'r', encoding='utf-8') as f:
+                self.lexicon = json.load(f)
+            self.postings = _memmap(self.dir / 'postings.i32', np.int32)
+            self.tf = _memmap(self.dir / 'tf.u16', np.uint16)
+            self.doclen = _memmap(self.dir / 'doclen.u32', np.uint32)
+        else:
+            self.lexicon = {}
+            self.postings = np.zeros(0, np.int32)
+            self.tf = np.zeros(0, np.uint16)
+            self.doclen = np.zeros(0, np.uint32)
+
+    def _load_delta(self):
+        # 增量部分：term -> [(row, tf)]
+        self.delta = defaultdict(list)
+        self.delta_lengths = {}
+        path = self.dir / 'delta.jsonl'
+        if not path.exists():
+            return
+        good = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if entry is None or not line.endswith(b'\n'):
+                    # 写到一半崩溃留下的残行：丢弃并截掉，之后的追加不会接在它后面
+                    logger.warning(f"Dropping a truncated line at the end of {path}")
+                    break
+                self._add_delta(**entry)
+                good += len(line)
+        if good < path.stat().st_size:
+            os.truncate(path, good)
+
+    def _remove_stale(self):
+        # 崩溃前没写完或已被替换的世代
+        for path in self.root.glob('gen-*'):
+            if path != self.dir:
+                shutil.rmtree(path, ignore_errors=True)
+        if (self.root / 'CURRENT.tmp').exists():
+            os.remove(self.root / 'CURRENT.tmp')
+        if self.generation:
+            for name in ('lexicon.json', 'postings.i32', 'tf.u16', 'doclen.u32', 'delta.jsonl'):
+                if (self.root / name).exists():
+                    os.remove(self.root / name)
+
+    def _add_delta(self, row, terms, length):
+        for term, tf in terms.items():
+            self.delta[term].append((row, tf))
+        self.delta_lengths[row] = length
+
+    @property
+    def size(self):
+        """Number of rows covered by the index"""
+        return max(len(self.doclen), max(self.delta_lengths, default=-1) + 1)
+
+    def add(self, start_row, texts):
+        """Index texts as rows start_row, start_row + 1, ..."""
+        entries = []
+        for offset, text in enumerate(texts):
+            tokens = tokenize(text)
+            entries.append({'row': start_row + offset, 'terms': dict(Counter(tokens)), 'length': len(tokens)})
+        with self._lock:
+            with open(self.dir / 'delta.jsonl', 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                    self._add_delta(**entry)
+            if len(self.delta_lengths) >= MERGE_THRESHOLD:
+                self._merge()
+
+    def merge(self):
+        """Fold the delta segment into the memory-mapped main segment"""
+        with self._lock:
+            self._merge()
+
+    def _merge(self, force=False):
+        if not self.delta_lengths and not force:
+            return
+        size = self.size
+        doclen = np.zeros(size, np.uint32)
+        doclen[:len(self.doclen)] = self.doclen
+        for row, length in self.delta_lengths.items():
+            doclen[row] = length
+
+        lexicon, postings, tfs, offset = {}, [], [], 0
+        for term in sorted(set(self.lexicon) | set(self.delta)):
+            ids, counts = [], []
+            if term in self.lexicon:
+                start, length = self.lexicon[term]
+                ids.append(np.asarray(self.postings[start:start + length]))
+                counts.append(np.asarray(self.tf[start:start + length]))
+            if term in self.delta:
+                rows, values = zip(*self.delta[term])
+                ids.append(np.array(rows, np.int32))
+                counts.append(np.minimum(np.array(values), 65535).astype(np.uint16))
+            ids, counts = np.concatenate(ids), np.concatenate(counts)
+            lexicon[term] = [offset, len(ids)]
+            offset += len(ids)
+            postings.append(ids)
+            tfs.append(counts)
+
+        # 新世代写完整之后才切换 CURRENT；新世代没有 delta.jsonl，旧的增量随旧世代一起作废
+        target = self.root / f'gen-{self.generation + 1}'
+        shutil.rmtree(target, ignore_errors=True)
+        target.mkdir()
+        _write(target / 'postings.i32', np.concatenate(postings) if postings else np.zeros(0, np.int32))
+        _write(target / 'tf.u16', np.concatenate(tfs) if tfs else np.zeros(0, np.uint16))
+        _write(target / 'doclen.u32', doclen)
+        with open(target / 'lexicon.json', 'w', encoding='utf-8') as f:
+            json.dump(lexicon, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        tmp = self.root / 'CURRENT.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(self.generation + 1))
+            f.flush()
+            os.fsync(f.fileno())
+        self.postings = self.tf = self.doclen = None
+        os.replace(tmp, self.root / 'CURRENT')
+        self.generation += 1
+        self.delta = defaultdict(list)
+        self.delta_lengths = {}
+        self._open_main()
+        self._remove_stale()
+        logger.info(f"Merged BM25 index: {len(lexicon)} terms, {offset} postings")
+
+    def rebuild(self, texts):
+        """Drop everything and index `texts` as rows 0..n-1 (used after compaction)"""
+        with self._lock:
+            # 只在内存里重建，由 _merge 写成新世代；崩溃时旧世代仍然完整
+            self.lexicon = {}
+            self.postings = np.zeros(0, np.int32)
+            self.tf = np.zeros(0, np.uint16)
+            self.doclen = np.zeros(0, np.uint32)
+            self.delta = defaultdict(list)
+            self.delta_lengths = {}
+            for row, text in enumerate(texts):
+                tokens = tokenize(text)
+                self._add_delta(row, dict(Counter(tokens)), len(tokens))
+            self._merge(force=True)
+
+    def scores(self, query, size=None, alive=None):
+        """BM25 score of every row for `query`; rows where `alive` is False get -inf"""
+        size = size or self.size
+        scores = np.zeros(size, np.float32)
+        with self._lock:
+            lengths = np.zeros(size, np.float32)
+            n = min(len(self.doclen), size)
+            lengths[:n] = self.doclen[:n]
+            for row, length in self.delta_lengths.items():
+                if row < size:
+                    lengths[row] = length
+            live = alive if alive is not None else lengths > 0
+            count = max(int(live.sum()), 1)
+            avgdl = max(float(lengths[live].mean()) if live.any() else 1.0, 1.0)
+
+            for term in set(tokenize(query)):
+                ids, tf = [], []
+                if term in self.lexicon:
+                    start, length = self.lexicon[term]
+                    ids.append(np.asarray(self.postings[start:start + length]))
+                    tf.append(np.asarray(self.tf[start:start + length], np.float32))
+                if term in self.delta:
+                    rows, values = zip(*self.delta[term])
+                    ids.append(np.array(rows, np.int32))
+                    tf.append(np.array(values, np.float32))
+                if not ids:
+                    continue
+                ids, tf = np.concatenate(ids), np.concatenate(tf)
+                keep = ids < size
+                ids, tf = ids[keep], tf[keep]
+                df = int(live[ids].sum())
+                idf = np.log(1 + (count - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[ids] / avgdl)
+                np.add.at(scores, ids, idf * tf * (self.k1 + 1) / (tf + norm))
+
+        if alive is not None:
+            scores[~alive] = -np.inf
+        return scores
+
+
+def _memmap(path, dtype):
+    if not path.exists() or path.stat().st_size == 0:
+        return np.zeros(0, dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+def _write(path, array):
+    tmp = path.with_name(path.name + '.tmp')
+    array.tofile(tmp)
+    os.replace(tmp, path)
@@ -0,0 +1,245 @@
+# knowledge_base/convert.py
+
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from blackboard.manifest import file_hash
+from blackboard.waits import PARTIAL_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED = ('.pdf', '.pptx')
+
+
+def read_front_matter(path):
+    """Return the front matter of a converted Markdown file as a dict ({} if missing)"""
+    meta = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.readline().strip() != '---':
+                return meta
+            for line in f:
+                line = line.rstrip('\n')
+                if line == '---':
+                    break
+                key, _, value = line.partition(': ')
+                meta[key] = value
+    except OSError:
+        pass
+    return meta
+
+
+def pptx_to_markdown(path):
+    """Convert a PPTX file to Markdown, one `## Slide N` section per slide"""
+    try:
+        from pptx import Presentation
+    except ImportError:
+        raise ImportError("python-pptx is required for PPTX conversion: pip install python-pptx")
+
+    sections = []
+    for number, slide in enumerate(Presentation(path).slides, 1):
+        lines = [f"## Slide {number}"]
+        title = slide.shapes.title.text.strip() if slide.shapes.title is not None else ''
+        if title:
+            lines.append(f"### {title}")
+        for shape in slide.shapes:
+            if shape == slide.shapes.title or not shape.has_text_frame:
+                continue
+            for paragraph in shape.text_frame.paragraphs:
+                text = ''.join(run.text for run in paragraph.runs).strip()
+                if text:
+                    lines.append('  ' * paragraph.level + '- ' + text)
+        if slide.has_notes_slide:
+            notes = slide.notes_slide.notes_text_frame.text.strip()
+            if notes:
+                lines.append(f"> {notes}")
+        sections.append('\n'.join(lines))
+    return '\n\n'.join(sections)
+
+
+def pdf_to_markdown(path):
+    """Convert a PDF file to Markdown, one `## Page N` section per page"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ImportError("pypdf is required for PDF conversion: pip install pypdf")
+
+    sections = []
+    for number, page in enumerate(PdfReader(path).pages, 1):
+        text = (page.extract_text() or '').strip()
+        sections.append(f"## Page {number}\n\n{text}")
+    return '\n\n'.join(sections)
+
+
+CONVERTERS = {
+    '.pdf': pdf_to_markdown,
+    '.pptx': pptx_to_markdown,
+}
+
+
+def convert_file(src, dst, source=None):
+    """
+    Convert one file to Markdown at `dst` unless `dst` was made from the same content.
+
+    Runs in a worker process. Returns (src, dst, status) with status
+    'converted', 'skipped' or 'failed: <error>'.
+    """
+    try:
+        digest = file_hash(src)
+        if read_front_matter(dst).get('sha256') == digest:
+            return src, dst, 'skipped'
+        body = CONVERTERS[os.path.splitext(src)[1].lower()](src)
+        header = f"---\nsource: {source or src}\nsha256: {digest}\n---\n\n"
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = dst + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(header + body + '\n')
+        os.replace(tmp, dst)
+        return src, dst, 'converted'
+    except Exception as e:
+        return src, dst, f'failed: {e}'
+
+
+class Converter:
+    """
+    PDF/PPTX to Markdown conversion stage backed by a process pool.
+
+    Files under `source_root` are converted into the same relative path under
+    `markdown_root` with a `.md` suffix. `submit()` is meant to be called as
+    downloads finish so conversion overlaps with downloading; `scan()` picks
+    up everything already on disk. `on_converted(dst)` is called for every
+    new Markdown file, one at a time on a thread of the converter's own.
+    """
+
+    def __init__(self, source_root, markdown_root, workers=None, on_converted=None):
+        self.source_root = Path(os.path.abspath(source_root))
+        self.markdown_root = Path(markdown_root)
+        self.on_converted = on_converted
+        self.workers = workers or os.cpu_count()
+        self.pool = self._new_pool()
+        self.counts = {'converted': 0, 'skipped': 0, 'failed': 0}
+        self._pending = set()
+        self._lock = threading.Lock()
+        # 回调（例如建立索引）可能很慢，不能在进程池的结果线程里执行，否则会拖住其他转换结果
+        self._converted = queue.Queue()
+        self._notifier = None
+        if on_converted:
+            self._notifier = threading.Thread(target=self._notify, name='converter-notify', daemon=True)
+            self._notifier.start()
+
+    def _new_pool(self):
+        # 下载和进度条线程已在运行，fork 可能复制到被持有的锁而死锁，用 spawn 启动子进程
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def target(self, path):
+        # 不用resolve()，符号链接指向的是内容存储而不是周文件夹
+        rel = Path(os.path.abspath(path)).relative_to(self.source_root)
+        return self.markdown_root / rel.with_suffix('.md'), rel
+
+    def submit(self, path):
+        """Queue a finished file for conversion; unsupported files are ignored"""
+        path = str(path)
+        if not path.lower().endswith(SUPPORTED) or path.endswith(PARTIAL_SUFFIXES):
+            return None
+        try:
+            dst, rel = self.target(path)
+        except ValueError:
+            logger.warning(f"{path} is outside {self.source_root}, not converting")
+            return None
+        with self._lock:
+            if path in self._pending:
+                return None
+            self._pending.add(path)
+        for attempt in range(2):
+            pool = self.pool
+            try:
+                future = pool.submit(convert_file, path, str(dst), rel.as_posix())
+                break
+            except BrokenProcessPool as e:
+                # 某个转换进程崩溃（例如被OOM杀掉）后整个进程池不可用，换一个新的
+                logger.error(f"Conversion pool is broken ({e}), starting a new one")
+                with self._lock:
+                    if self.pool is pool:
+                        self.pool = self._new_pool()
+                pool.shutdown(wait=False)
+        else:
+            with self._lock:
+                self._pending.discard(path)
+            return None
+        future.add_done_callback(lambda future: self._done(future, path))
+        return future
+
+    def _done(self, future, path):
+        try:
+            src, dst, status = future.result()
+        except Exception as e:
+            logger.error(f"Conversion worker failed on {path}: {e}")
+            with self._lock:
+                self.counts['failed'] += 1
+            return
+        finally:
+            # 失败的文件也要移出，之后才能重新提交
+            with self._lock:
+                self._pending.discard(path)
+        with self._lock:
+            self.counts[status.split(':')[0]] += 1
+        if status == 'converted':
+            logger.info(f"Converted {src} -> {dst}")
+            if self._notifier:
+                self._converted.put(dst)
+        elif status != 'skipped':
+            logger.warning(f"Conversion of {src} {status}")
+
+    def _notify(self):
+        while True:
+            dst = self._converted.get()
+            if dst is None:
+                return
+            try:
+                self.on_converted(dst)
+            except Exception as e:
+                logger.error(f"Handling converted file {dst} failed: {e}")
+
+    def scan(self):
+        """Submit every supported file under the source root"""
+        futures = []
+        for dirpath, dirnames, filenames in os.walk(self.source_root):
+            # 跳过内容存储、manifest等隐藏目录
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                future = self.submit(os.path.join(dirpath, name))
+                if future:
+                    futures.append(future)
+        return futures
+
+    def close(self, wait=True):
+        self.pool.shutdown(wait=wait)
+        if self._notifier:
+            self._converted.put(None)
+            if wait:
+                self._notifier.join()
+        logger.info(f"Conversion finished: {self.counts}")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Convert downloaded PDF/PPTX files to Markdown")
+    parser.add_argument('source', help="download folder")
+    parser.add_argument('target', help="Markdown output folder")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    converter = Converter(args.source, args.target, workers=args.workers)
+    converter.scan()
+    converter.close()
+
+
+if __name__ == '__main__':
+    main()
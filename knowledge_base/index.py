@@ -0,0 +1,353 @@
+# knowledge_base/index.py
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .convert import read_front_matter
+
+logger = logging.getLogger(__name__)
+
+SECTION_RE = re.compile(r'^## (Slide|Page) (\d+)\s*$', re.MULTILINE)
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_CHUNK_CHARS = 1500
+
+
+def chunk_markdown(path, markdown_root=None):
+    """
+    Split a converted Markdown file into chunks, one per slide or page.
+
+    Long sections are split again at paragraph boundaries. Every chunk
+    carries `course`, `week`, `file` and `page` taken from the front matter's
+    source path (`[course/]Week_N/file`).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    front = read_front_matter(path)
+    if text.startswith('---\n'):
+        text = text.split('\n---\n', 1)[-1]
+
+    source = front.get('source')
+    if not source and markdown_root:
+        source = Path(path).relative_to(markdown_root).as_posix()
+    parts = Path(source or Path(path).name).parts
+    meta = {
+        'file': parts[-1],
+        'week': parts[-2] if len(parts) >= 2 else '',
+        'course': parts[-3] if len(parts) >= 3 else '',
+        'source': source or str(path),
+    }
+
+    sections = []
+    matches = list(SECTION_RE.finditer(text))
+    if not matches:
+        sections.append((None, text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append((int(match.group(2)), text[match.end():end]))
+
+    chunks = []
+    for page, body in sections:
+        for piece in _split(body.strip()):
+            chunks.append({**meta, 'page': page, 'text': piece})
+    return chunks
+
+
+def _split(text, limit=MAX_CHUNK_CHARS):
+    if not text:
+        return []
+    if len(text) <= limit:
+        return [text]
+    pieces, current = [], ''
+    for paragraph in text.split('\n\n'):
+        if current and len(current) + len(paragraph) + 2 > limit:
+            pieces.append(current)
+            current = ''
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+        while len(current) > limit:
+            pieces.append(current[:limit])
+            current = current[limit:]
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class HashingEmbedder:
+    """Dependency-free embedding: signed feature hashing of unigrams and bigrams with sublinear TF"""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, tokens):
+        yield from tokens
+        yield from (f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(tokenize(text)):
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                h = int.from_bytes(digest, 'little')
+                index, sign = h % self.dim, 1.0 if (h >> 63) else -1.0
+                counts[index] = counts.get(index, 0.0) + sign
+            for index, value in counts.items():
+                matrix[row, index] = np.sign(value) * (1.0 + np.log(abs(value))) if value else 0.0
+        return _normalize(matrix)
+
+
+class SentenceEmbedder:
+    """Small CPU-friendly sentence-transformers model, used when the package is installed"""
+
+    def __init__(self, model='all-MiniLM-L6-v2'):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model}"
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+        return _normalize(vectors.astype(np.float32))
+
+
+def make_embedder(name='hashing'):
+    """Return the configured embedder, falling back to hashing when the model is unavailable"""
+    if name and name != 'hashing':
+        try:
+            return SentenceEmbedder(name)
+        except ImportError:
+            logger.warning("sentence-transformers is not installed, using the hashing embedder")
+    return HashingEmbedder()
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """
+    Incrementally updatable vector index over Markdown chunks.
+
+    Vectors are appended to a float32 file that is read back as a NumPy
+    memmap; chunk metadata goes to `chunks.jsonl` in the same row order.
+    `files.json` maps each indexed file to its hash and row range, so a
+    changed file only re-embeds its own chunks and the old rows are ignored
+    until `compact()`.
+    """
+
+    def __init__(self, root, embedder=None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._alive = None
+
+        meta = self._read_json('meta.json', {})
+        if meta and (meta['embedder'], meta['dim']) != (self.embedder.name, self.embedder.dim):
+            raise ValueError(f"Index at {root} was built with {meta['embedder']}, not {self.embedder.name}")
+        self.count = meta.get('count', 0)
+        self.files = self._read_json('files.json', {})
+        self.chunks = self._truncate_to_count()
+
+    def _truncate_to_count(self):
+        """
+        Cut vectors.f32 and chunks.jsonl back to the `count` rows recorded in meta.json.
+
+        A crash after appending rows but before meta.json was written leaves
+        stale rows at the end of both files; later appends must not land
+        after them. Returns the chunks that are kept.
+        """
+        # meta.json 最后写入，它记录的行数才是完整写入的行数
+        vectors_path = self.root / 'vectors.f32'
+        size = self.count * self.embedder.dim * 4
+        if vectors_path.exists() and vectors_path.stat().st_size > size:
+            logger.warning(f"Dropping rows after {self.count} in {vectors_path} left by an interrupted update")
+            os.truncate(vectors_path, size)
+
+        chunks, offset = [], 0
+        chunks_path = self.root / 'chunks.jsonl'
+        if chunks_path.exists():
+            with open(chunks_path, 'rb') as f:
+                for line in f:
+                    if len(chunks) == self.count:
+                        break
+                    chunks.append(json.loads(line))
+                    offset += len(line)
+            if chunks_path.stat().st_size > offset:
+                os.truncate(chunks_path, offset)
+
+        # files.json 在 meta.json 之前写入，可能引用了被丢弃的行
+        stale = [key for key, entry in self.files.items() if entry['rows'][1] > self.count]
+        for key in stale:
+            del self.files[key]
+        if stale:
+            self._write_json('files.json', self.files)
+        return chunks
+
+    def _read_json(self, name, default):
+        path = self.root / name
+        if not path.exists():
+            return default
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_json(self, name, data):
+        tmp = self.root / (name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.root / name)
+
+    def update_file(self, path, markdown_root=None):
+        """(Re)index one Markdown file; returns the number of new chunks (0 if unchanged)"""
+        key = str(Path(path).resolve())
+        digest = read_front_matter(path).get('sha256') or _file_digest(path)
+        with self._lock:
+            if self.files.get(key, {}).get('sha256') == digest:
+                return 0
+        chunks = chunk_markdown(path, markdown_root)
+        vectors = self.embedder.embed([c['text'] for c in chunks]) if chunks else np.zeros((0, self.embedder.dim), np.float32)
+
+        with self._lock:
+            start = self.count
+            with open(self.root / 'vectors.f32', 'ab') as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self.root / 'chunks.jsonl', 'a', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+            self.chunks.extend(chunks)
+            self.count += len(chunks)
+            self.files[key] = {'sha256': digest, 'rows': [start, self.count]}
+            self._write_json('files.json', self.files)
+            self._write_json('meta.json', {'embedder': self.embedder.name, 'dim': self.embedder.dim, 'count': self.count})
+            self._matrix = None
+        logger.info(f"Indexed {len(chunks)} chunks from {path}")
+        return len(chunks)
+
+    def update_tree(self, markdown_root):
+        """Index every Markdown file under `markdown_root`; returns the number of new chunks"""
+        added = 0
+        for path in sorted(Path(markdown_root).rglob('*.md')):
+            added += self.update_file(path, markdown_root)
+        return added
+
+    def remove_file(self, path):
+        with self._lock:
+            if self.files.pop(str(Path(path).resolve()), None):
+                self._write_json('files.json', self.files)
+                self._matrix = None
+
+    def _load(self):
+        if self._matrix is None:
+            if self.count:
+                self._matrix = np.memmap(self.root / 'vectors.f32', dtype=np.float32, mode='r',
+                                         shape=(self.count, self.embedder.dim))
+            else:
+                self._matrix = np.zeros((0, self.embedder.dim), np.float32)
+            alive = np.zeros(self.count, dtype=bool)
+            for entry in self.files.values():
+                alive[entry['rows'][0]:entry['rows'][1]] = True
+            self._alive = alive
+        return self._matrix, self._alive
+
+    def alive(self):
+        """Boolean mask of the rows that belong to currently indexed files"""
+        with self._lock:
+            return self._load()[1]
+
+    def scores(self, query):
+        """Cosine similarity of the query with every row (dead rows get -inf)"""
+        with self._lock:
+            matrix, alive = self._load()
+        q = self.embedder.embed([query])[0]
+        scores = matrix @ q
+        scores[~alive] = -np.inf
+        return scores
+
+    def search(self, query, k=5):
+        """Return the top-k chunks as dicts with `score` and a `citation` string"""
+        scores = self.scores(query)
+        return self.top_k(scores, k)
+
+    def top_k(self, scores, k):
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**self.chunks[i], 'row': int(i), 'score': float(scores[i]), 'citation': citation(self.chunks[i])}
+                for i in top]
+
+    def compact(self):
+        """Rewrite the index without rows of changed or removed files"""
+        with self._lock:
+            matrix, alive = self._load()
+            order = sorted(self.files.items(), key=lambda kv: kv[1]['rows'][0])
+            vectors, chunks, files = [], [], {}
+            for key, entry in order:
+                start, end = entry['rows']
+                files[key] = {'sha256': entry['sha256'], 'rows': [len(chunks), len(chunks) + end - start]}
+                vectors.append(np.asarray(matrix[start:end]))
+                chunks.extend(self.chunks[start:end])
+            self._matrix = None
+            data = np.concatenate(vectors) if vectors else np.zeros((0, self.embedder.dim), np.float32)
+            data.astype(np.float32).tofile(self.root / 'vectors.f32.tmp')
+            os.replace(self.root / 'vectors.f32.tmp', self.root / 'vectors.f32')
+            with open(self.root / 'chunks.jsonl.tmp', 'w', encoding='utf-8') as f:
+                for chunk in chunks:
+                    f.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+            os.replace(self.root / 'chunks.jsonl.tmp', self.root / 'chunks.jsonl')
+            self.chunks, self.files, self.count = chunks, files, len(chunks)
+            self._write_json('files.json', self.files)
+            self._write_json('meta.json', {'embedder': self.embedder.name, 'dim': self.embedder.dim, 'count': self.count})
+
+
+def citation(chunk):
+    """Human readable source of a chunk, e.g. `JC3008 / Week_3 / Lecture 5.pptx, slide 12`"""
+    parts = [p for p in (chunk.get('course'), chunk.get('week'), chunk.get('file')) if p]
+    where = ' / '.join(parts)
+    if chunk.get('page'):
+        unit = 'slide' if chunk.get('file', '').lower().endswith('.pptx') else 'page'
+        where += f", {unit} {chunk['page']}"
+    return where
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main():
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build or query the local knowledge base index")
+    parser.add_argument('index', help="index folder")
+    parser.add_argument('--build', metavar='MARKDOWN', help="index every Markdown file under this folder")
+    parser.add_argument('--query', help="text to search for")
+    parser.add_argument('-k', type=int, default=5, help="number of results")
+    parser.add_argument('--embedder', default='hashing', help="'hashing' or a sentence-transformers model name")
+    args = parser.parse_args()
+
+    index = VectorIndex(args.index, make_embedder(args.embedder))
+    if args.build:
+        index.update_tree(args.build)
+    if args.query:
+        for result in index.search(args.query, args.k):
+            print(f"{result['score']:.3f}  [{result['citation']}]  {result['text'][:120]!r}")
+
+
+if __name__ == '__main__':
+    main()
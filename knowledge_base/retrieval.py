@@ -0,0 +1,118 @@
+# knowledge_base/retrieval.py
+
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .bm25 import BM25Index
+from .index import VectorIndex, citation, make_embedder
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+CANDIDATES = 50
+
+
+def rrf(rankings, k=RRF_K):
+    """Reciprocal-rank fusion of several ranked row lists; returns {row: score}"""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank + 1)
+    return fused
+
+
+def _ranked(scores, n):
+    """Rows with a positive score, best first, at most `n` of them"""
+    # 没有匹配的行（BM25为0、向量不相似、已删除为-inf）不参与排名，否则RRF会把它们当作命中
+    n = min(n, int((scores > 0).sum()))
+    if n <= 0:
+        return []
+    top = np.argpartition(-scores, n - 1)[:n]
+    return [int(i) for i in top[np.argsort(-scores[top])]]
+
+
+class Retriever:
+    """
+    Hybrid retrieval over the knowledge base: vector similarity plus BM25,
+    fused with reciprocal-rank fusion.
+
+    Keeps a `VectorIndex` in `<root>/vectors` and a `BM25Index` over the same
+    rows in `<root>/bm25`. `update_file` indexes one Markdown file in both.
+    """
+
+    def __init__(self, root, embedder=None):
+        self.root = Path(root)
+        self.vectors = VectorIndex(self.root / 'vectors', embedder)
+        self.bm25 = BM25Index(self.root / 'bm25')
+        self._lock = threading.Lock()
+        if self.bm25.size != self.vectors.count:
+            # 行数不一致（旧版本建立的索引、compact 或截断后崩溃）：BM25的行号已不可信，整体重建
+            logger.info(f"BM25 index has {self.bm25.size} rows, vector index {self.vectors.count}; rebuilding")
+            self.bm25.rebuild([c['text'] for c in self.vectors.chunks])
+
+    def update_file(self, path, markdown_root=None):
+        """Index one Markdown file for both vector and keyword search"""
+        with self._lock:
+            start = self.vectors.count
+            added = self.vectors.update_file(path, markdown_root)
+            if added:
+                self.bm25.add(start, [c['text'] for c in self.vectors.chunks[start:start + added]])
+        return added
+
+    def update_tree(self, markdown_root):
+        added = 0
+        for path in sorted(Path(markdown_root).rglob('*.md')):
+            added += self.update_file(path, markdown_root)
+        self.bm25.merge()
+        return added
+
+    def compact(self):
+        with self._lock:
+            self.vectors.compact()
+            self.bm25.rebuild([c['text'] for c in self.vectors.chunks])
+
+    def search(self, query, k=5, mode='hybrid', candidates=CANDIDATES):
+        """
+        Return the top-k chunks for `query` with `score` and `citation`.
+
+        `mode` is 'hybrid' (RRF of both rankings), 'vector' or 'bm25'.
+        """
+        alive = self.vectors.alive()
+        size = len(alive)
+        rankings = []
+        if mode in ('hybrid', 'vector'):
+            rankings.append(_ranked(self.vectors.scores(query), candidates))
+        if mode in ('hybrid', 'bm25'):
+            rankings.append(_ranked(self.bm25.scores(query, size, alive), candidates))
+
+        fused = rrf(rankings)
+        top = sorted(fused, key=fused.get, reverse=True)[:k]
+        chunks = self.vectors.chunks
+        return [{**chunks[row], 'row': row, 'score': fused[row], 'citation': citation(chunks[row])} for row in top]
+
+
+def main():
+    import argparse
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + vector search over the knowledge base")
+    parser.add_argument('index', help="index folder")
+    parser.add_argument('--build', metavar='MARKDOWN', help="index every Markdown file under this folder")
+    parser.add_argument('--query', help="text to search for")
+    parser.add_argument('-k', type=int, default=5, help="number of results")
+    parser.add_argument('--mode', default='hybrid', choices=['hybrid', 'vector', 'bm25'])
+    parser.add_argument('--embedder', default='hashing', help="'hashing' or a sentence-transformers model name")
+    args = parser.parse_args()
+
+    retriever = Retriever(args.index, make_embedder(args.embedder))
+    if args.build:
+        retriever.update_tree(args.build)
+    if args.query:
+        for result in retriever.search(args.query, args.k, args.mode):
+            print(f"{result['score']:.4f}  [{result['citation']}]  {result['text'][:120]!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,22 @@
-import time
 import json
+import argparse
 import os
 import logging
+import threading
 from pathlib import Path
-from tqdm import tqdm
-from retrying import retry
-from DrissionPage import ChromiumPage, ChromiumOptions
+from concurrent.futures import ThreadPoolExecutor
+from DrissionPage import ChromiumPage
+from DrissionPage.errors import PageDisconnectedError, WaitTimeoutError
+from blackboard import diagnostics, metrics, strategies
+from knowledge_base import Converter, Retriever, make_embedder
+from blackboard import (
+    download_all, open_tab, HttpDownloader, Manifest, Checkpoint, cleanup_partials, safe_filename,
+    OutlineClient, collect_links, filter_links, LINK_SELECTOR, build_options, prepare_tab,
+    RetryPolicy, CircuitBreaker, FailureReport, with_retries, BlobStore, Pipeline, Stage,
+)
+from blackboard.waits import (
+    wait_until, wait_ele, wait_report,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +35,34 @@ DEFAULT_CONFIG = {
    'download_path': 'downloads',
    'timeout': 10,
    'retry_times': 3,
+   'retry_backoff': 2,  # 重试的基础等待秒数，按指数增长并加随机抖动
+   'retry_max_delay': 60,
+   'breaker_threshold': 5,  # 连续失败多少次后暂停该课程的所有下载
+   'breaker_cooldown': 60,
+   'workers': 1,  # 并行下载的标签页数量
+   'download_mode': 'browser',  # 'browser' 或 'http'（登录后直接用HTTP下载）
+   'http_workers': 8,
+   'dedup': False,  # 按内容哈希只存一份文件，链接到各周文件夹
+   'link_mode': 'hardlink',  # 'hardlink' 或 'symlink'
+   'convert': False,  # 下载完成的PDF/PPTX在进程池中转换为Markdown
+   'markdown_path': 'markdown',
+   'index': False,  # 把转换后的Markdown切块、向量化，加入本地知识库索引
+   'index_path': 'kb_index',
+   'embedder': 'hashing',  # 或sentence-transformers模型名，如 'all-MiniLM-L6-v2'
+   'incremental': False,  # 根据manifest只下载新增或有变化的内容，不再询问起始序号
+   'pipeline': False,  # 发现、下载、转换、索引用有界队列串成流水线，发现第一周后立即开始下载
+   'course_url': "https://abdn.blackboard.com/ultra/courses/_66721_1/outline",
+   'courses_file': 'course.json',  # 批量模式下的课程列表
+   'course_workers': 3,  # 批量模式下同时爬取的课程数
+   'lectures_title': 'Lectures',  # 按标题查找讲座文件夹
+   'diagnostics': False,  # 下载失败时把页面结构快照写入 diagnostics_dir
+   'diagnostics_dir': 'diagnostics',
+   'metrics': False,  # 记录各阶段耗时和计数，运行结束时写入 metrics_dir（JSON 和 Prometheus 文本格式）
+   'metrics_dir': 'metrics',
+   'browser_profile': 'default',  # 'fast'：无头、不加载图片/字体/媒体/统计脚本
+   'user_data_dir': None,  # 持久化浏览器用户目录，会话有效时跳过登录
+   'browser_port': 9333,  # 使用 user_data_dir 时浏览器的调试端口，固定端口才能连回同一个浏览器；否则自动选择端口
+   'discovery': 'api',  # 'api'：通过Ultra的JSON接口获取目录，失败时退回 'dom' 页面解析
        'selectors': {
         'username': '#user_id',
         'password': '#password', 
@@ -63,335 +102,477 @@ def get_credentials():
        save_config(config)
        return username, password
 
-def create_week_folder(week_text):
-   """Create and return week folder path"""
-   config = load_config()
-   base_path = Path(config['download_path'])
+def create_week_folder(week_text, base_path=None):
+   """
+   Create and return week folder path.
+
+   "Week 3 - Regular languages" becomes `Week_3`; a title without a week
+   number (e.g. loose items directly under Lectures) keeps its own name.
+   """
+   if base_path is None:
+       base_path = load_config()['download_path']
+   base_path = Path(base_path)
    week_num = ''.join(filter(str.isdigit, week_text.split('-')[0]))
-   folder_path = base_path / f"Week_{week_num}"
+   # 没有周数时不能都放进同一个 "Week_" 文件夹
+   folder_path = base_path / (f"Week_{week_num}" if week_num else safe_filename(week_text or 'Other'))
    folder_path.mkdir(parents=True, exist_ok=True)
    return str(folder_path)
 
-def scroll_to_bottom(page):
-   """Scroll to bottom of page"""
-   last_height = page.run_js("return document.documentElement.scrollHeight")
-   while True:
-       page.run_js("window.scrollTo(0, document.documentElement.scrollHeight);")
-       time.sleep(1)
-       new_height = page.run_js("return document.documentElement.scrollHeight")
-       if new_height == last_height:
-           break
-       last_height = new_height
-
-# @retry(stop_max_attempt_number=3, wait_exponential_multiplier=1000)
-# def wait_and_click(page, selector, timeout=10, download=False):
-#    """Wait for and click element"""
-#    start_time = time.time()
-#    while time.time() - start_time < timeout:
-#        try:
-#            ele = page.ele(selector, timeout=0.5)
-#            if ele:
-#                if download:
-#                    ele.click.to_download()
-#                else:
-#                    ele.click()
-#                return True
-#        except Exception as e:
-#            logger.debug(f"Click wait failed: {e}")
-#            time.sleep(0.5)
-#    raise TimeoutError(f"Button '{selector}' not found or clickable within {timeout} seconds")
-
-def get_week_content(page, week_button):
-    """Get content links for each week"""
-    try:
-        week_text = week_button.text
-        logger.info(f"\n{'='*50}\nProcessing {week_text}\n{'='*50}")
-        
-        # 1. 获取content_id
-        content_id = week_button.attr('aria-controls')
-        logger.debug(f"Content ID: {content_id}")
-        
-        # 2. 如果文件夹未展开，则展开它
-        if week_button.attr('aria-expanded') == 'false':
-            week_button.click()
-            time.sleep(2)  # 给内容加载一点时间
-        
-        # 3. 直接使用有效的XPath选择器
-        selector = f"xpath://div[@id='{content_id}']//a[contains(@class, 'MuiTypography')]"
-        links = page.eles(selector, timeout=5)
-        
-        if links:
-            valid_links = []
-            for link in links:
-                href = link.attr('href')
-                text = link.text
-                if href and text and '/ultra/courses/' in href:
-                    valid_links.append((href, text, week_text))
-                    logger.info(f"Link found - href: {href}, text: {text}")
-            
-            if valid_links:
-                logger.info(f"Successfully found {len(valid_links)} valid links")
-                return valid_links
-        
-        logger.warning(f"No valid links found in {week_text}")
-        return []
+def download_content(page, url, title, week_folder, downloader=None):
+    """Download content from the page; `downloader` supplies the file name it already resolved, if any"""
+    with metrics.span('browser_item'):
+        return _download_content(page, url, title, week_folder, downloader)
 
-    except Exception as e:
-        logger.error(f"Failed to get week content: {e}")
-        return []
-
-def get_all_buttons_info(page):
-    """获取页面上所有按钮的详细信息"""
+def _download_content(page, url, title, week_folder, downloader=None):
     try:
-        # 使用多种方式查找按钮
-        selectors = [
-            'button',  # 所有按钮
-            '[role="button"]',  # 具有button角色的元素
-            '.MuiButtonBase-root',  # Material UI按钮
-            '[aria-label*="Download"]',  # 包含Download的label
-            '[title*="Download"]'  # 包含Download的title
-        ]
-        
-        for selector in selectors:
-            elements = page.eles(selector)
-            logger.debug(f"\nFound {len(elements)} elements with selector '{selector}':")
-            for idx, element in enumerate(elements):
-                logger.debug(f"\nElement {idx + 1}:")
-                logger.debug(f"HTML: {element.html}")
-                logger.debug(f"Text: {element.text if element.text else 'No text'}")
-                logger.debug(f"Class: {element.attr('class')}")
-                logger.debug(f"Role: {element.attr('role')}")
-                logger.debug(f"Aria-label: {element.attr('aria-label')}")
-                logger.debug(f"Title: {element.attr('title')}")
-                
-    except Exception as e:
-        logger.error(f"Error in get_all_buttons_info: {e}")
+        with metrics.span('page_load'):
+            if page.get(url) is False:
+                raise TimeoutError(f"Loading {url} failed")
 
-def click_download_button(page):
-    """Locate and click the download button"""
-    try:
-        # 首先获取页面上所有按钮的信息
-        logger.debug("\n=== Scanning page for buttons ===")
-        get_all_buttons_info(page)
-        
-        # 更新的选择器列表
-        selectors = [
-            # Material UI按钮
-            "[class*='MuiButtonBase'][class*='root']",
-            
-            # 通过aria属性
-            "[aria-label*='download' i]",  # i表示不区分大小写
-            
-            # 通过title属性
-            "[title*='download' i]",
-            
-            # 具有下载图标的按钮
-            "xpath://button[.//svg]",
-            
-            # 更宽松的SVG路径匹配
-            "xpath://button[.//svg[.//path]]",
-            
-            # 任何可能是下载按钮的元素
-            "[role='button']",
-            
-            # 尝试定位父容器
-            "div[class*='makeStyles'] button"
-        ]
-        
-        for selector in selectors:
-            try:
-                logger.debug(f"\nTrying to find download button with selector: {selector}")
-                
-                elements = page.eles(selector)
-                logger.debug(f"Found {len(elements)} matching elements")
-                
-                for element in elements:
-                    logger.debug(f"Element HTML: {element.html}")
-                    logger.debug(f"Element text: {element.text}")
-                    
-                    # 尝试点击每个可能的按钮
-                    element.click()
-                    time.sleep(1)
-                    
-                    # 检查点击后是否出现下载选项
-                    download_options = page.eles("span:contains('Download original file')")
-                    if download_options:
-                        logger.info("Found download option after click")
-                        return True
-                        
-            except Exception as e:
-                logger.debug(f"Failed with selector {selector}: {str(e)}")
-                continue
-                
-        logger.warning("Could not find download button with any selector")
-        return False
-        
-    except Exception as e:
-        logger.error(f"Error in click_download_button: {e}")
-        return False
-    
-def wait_and_click(page, selector, timeout=10, download=False, week_folder=None, title=None):
-    if not download:
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                page.wait.eles_loaded(selector)
-                button = page.ele(selector, timeout=0.5)
-                button.click()
-                return True
-            except:
-                pass
-        raise TimeoutError(f"按钮 '{selector}' 在 {timeout} 秒内未出现或无法点击")
-    else:
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                page.wait.eles_loaded(selector)
-                button = page.ele(selector, timeout=0.5)
-                button.click.to_download(folder=week_folder, rename=title)
-                return True
-            except:
-                pass
-        raise TimeoutError(f"按钮 '{selector}' 在 {timeout} 秒内未出现或无法点击")
-    
-
-
-def download_content(page, url, title, week_folder):
-    """Download content from the page"""
-    try:
-        page.get(url)
-        time.sleep(2)
-        
-        # 等待页面加载 - 等待更多选项SVG图标出现
-        # 等待页面加载
-        page.wait.ele_displayed('xpath://svg[contains(@class, "MuiSvgIcon") and contains(@class, "ms-Button-icon")]',
-                                timeout=6)
-
-        # 首先尝试直接下载按钮
-        try:
-            direct_button = page.ele('xpath://button[@aria-label="Download"]', timeout=5)
-            if direct_button:
-                direct_button.click()
-                logger.info(f"Successfully downloaded (direct): {title}")
-                time.sleep(2)
-                return True
-        except Exception as e:
-            logger.debug(f"Direct download button not found: {str(e)}")
-
-        # 如果没有直接下载按钮，尝试通过更多选项下载
-        try:
-            # 点击更多选项按钮
-            button = page.ele('css=button[class*="MuiButtonBase"][class*="MuiIconButton"]', timeout=5)
-            button.click()
-            print("展开下载选项")
-            ###button = page.wait.ele_displayed('css=button[data-analytics-id*="inlineRender.toggle"]', timeout=5)
-####button.click()
-
-            # 尝试点击 "Download original file" 按钮
-            button = page.ele('css=button[aria-label="Download"]', timeout=5)
-            button.click()
-        except Exception as e:
-            print(f"无法完成下载操作: {url}")
-            print(f"错误信息: {str(e)}")
+            # 等待页面加载 - 等待更多选项SVG图标出现
+            # 等待页面加载
+            page.wait.ele_displayed('xpath://svg[contains(@class, "MuiSvgIcon") and contains(@class, "ms-Button-icon")]',
+                                    timeout=6)
+
+        # 先用上次成功的点击顺序，其次是内置的直接下载/更多选项，最后逐个按钮探测
+        file_name, content_type = downloader.known_file(url) if downloader else (None, None)
+        path, strategy = strategies.download(page, url, title, week_folder,
+                                             file_name=file_name, content_type=content_type)
+        if path:
+            logger.info(f"Successfully downloaded ({strategy}): {title}")
+            return path
 
+        print(f"无法完成下载操作: {url}")
+        diagnostics.capture(page, title, 'no download strategy worked', url=url)
         logger.warning(f"Failed to download: {title}")
         return False
-    
+
+    except (TimeoutError, ConnectionError, PageDisconnectedError, WaitTimeoutError) as e:
+        # 页面加载超时或连接断开交给重试和断路器处理
+        logger.error(f"Download failed {title}: {e}")
+        diagnostics.capture(page, title, e, url=url)
+        raise TimeoutError(f"{title}: {e}") from e
     except Exception as e:
         logger.error(f"Download failed {title}: {e}")
+        diagnostics.capture(page, title, e, url=url)
         return False
 def debug_page_structure(page):
     """Debug helper to analyze page structure"""
-    try:
-        logger.debug("\n=== Page Structure Analysis ===")
-        # 打印所有按钮
-        buttons = page.eles('button')
-        logger.debug(f"Found {len(buttons)} buttons:")
-        for btn in buttons:
-            logger.debug(f"Button HTML: {btn.html}")
-            
-        # 打印所有带有data-ally属性的元素
-        ally_elements = page.eles('[data-ally-invoke]')
-        logger.debug(f"\nFound {len(ally_elements)} ally elements:")
-        for elem in ally_elements:
-            logger.debug(f"Ally element HTML: {elem.html}")
-            
-    except Exception as e:
-        logger.error(f"Debug failed: {e}")
+    return diagnostics.log_snapshot(page, ['button', '[data-ally-invoke]'])
+
+
+def login(page, config, course_url):
+   """Open the course page and log in unless the stored session is still valid"""
+   logger.info("Accessing course page...")
+   page.get(course_url)
+   outline = "xpath://button[starts-with(@id, 'folder-title-')]"
+   state = wait_until(
+       lambda: ('outline' if page.ele(outline, timeout=0) else
+                'login' if page.ele(config['selectors']['username'], timeout=0) else None),
+       timeout=config['timeout'], name='login page')
+   if state == 'outline':
+       logger.info("Session is still valid, skipping login")
+       return
+
+   username, password = get_credentials()
+   page.ele(config['selectors']['username']).input(username)
+   page.ele(config['selectors']['password']).input(password)
+   page.ele(config['selectors']['login_button']).click()
+
+   logger.info("Waiting for Lectures & Practical Sessions button...") 
+   wait_ele(page, outline, timeout=config['timeout'], name='login')
+
+def find_lectures_button(page, config):
+   """Find the lectures folder button of the current course"""
+   # 先按配置的id查找，再按标题查找，适用于id不同的其他课程
+   lectures_button = page.ele(config['selectors']['lectures_button'], timeout=0)
+   if not lectures_button:
+       logger.info("Lectures button not found by ID, looking it up by title...")
+       lectures_button = page.ele(
+           f"xpath://button[starts-with(@id, 'folder-title-') and contains(normalize-space(.), '{config['lectures_title']}')]",
+           timeout=2)
+   return lectures_button
+
+def discover_content_api(page, config, course_url):
+   """Collect (url, title, week) from the Ultra JSON endpoints"""
+   client = OutlineClient.from_page(page, course_url, timeout=config['timeout'], workers=config['http_workers'])
+   try:
+       all_content = client.discover(course_url, config['lectures_title'])
+       logger.info(f"Found {len(all_content)} content items via the API")
+       return all_content
+   except Exception as e:
+       logger.warning(f"API discovery failed, falling back to the page: {e}")
+       return []
+   finally:
+       client.close()
+
+def discover_content(page, config):
+   """Expand the Lectures folder and its weeks in the page and collect (url, title, week) for every link"""
+   lectures_button = find_lectures_button(page, config)
+   root = None
+   if lectures_button:
+       root = f"#{lectures_button.attr('id')}"
+       logger.info("Found Lectures button, expanding it and its week folders...")
+   else:
+       logger.warning("Cannot find Lectures button, using the week folders on the outline")
+
+   # 展开、滚动和收集链接都在页面内完成，一次调用返回整个目录
+   with metrics.span('collect_links'):
+       links, folders = collect_links(page, root, link_selector=LINK_SELECTOR,
+                                      folder_selector=config['selectors']['week_buttons'], timeout=config['timeout'] * 6)
+   all_content = filter_links(links)
+   logger.info(f"Found {len(all_content)} content items in {len(folders)} folders")
+   return all_content
+
+def iter_content(page, config, course_url):
+   """
+   Yield (url, title, week) lists week by week from the API, or the whole outline at once from the page.
+
+   If the API fails part way, the page supplies the items that were not yielded yet.
+   """
+   seen = set()
+   if config['discovery'] == 'api':
+       client = OutlineClient.from_page(page, course_url, timeout=config['timeout'], workers=config['http_workers'])
+       try:
+           for links in client.iter_discover(course_url, config['lectures_title']):
+               seen.update(url for url, _, _ in links)
+               yield links
+           if seen:
+               return
+       except Exception as e:
+           logger.warning(f"API discovery failed after {len(seen)} items, falling back to the page: {e}")
+       finally:
+           client.close()
+
+   if page.url != course_url:
+       page.get(course_url)
+       wait_ele(page, "xpath://button[starts-with(@id, 'folder-title-')]", timeout=config['timeout'], name='outline')
+   # 页面上收集整个目录，跳过API已经交给下载阶段的条目
+   yield [link for link in discover_content(page, config) if link[0] not in seen]
+
+def load_courses(path):
+   """Load {course name: outline url} from course.json"""
+   with open(path, 'r', encoding='utf-8') as f:
+       return json.load(f)
 
+def run_course(page, config, course_url, download_root, downloader=None, resume=False, interactive=True, store=None,
+               converter=None, index=None):
+   """
+   Crawl one course in `page` and download it into `download_root`.
 
-def main():
+   Returns the list of failed items, or None if the course could not be crawled.
+   """
+   if config['pipeline']:
+       try:
+           return run_course_pipeline(page, config, course_url, download_root, downloader, resume, store,
+                                      converter, index)
+       except Exception as e:
+           logger.error(f"Error occurred in {course_url}: {e}")
+           return None
+   Path(download_root).mkdir(parents=True, exist_ok=True)
+   manifest = Manifest.for_download_path(download_root) if config['incremental'] else None
+   checkpoint = Checkpoint.for_download_path(download_root)
+
+   try:
+       items = None
+       if resume:
+           if checkpoint.load():
+               # 清理上次中断留下的未完成文件，对应条目会重新下载
+               removed = cleanup_partials(download_root)
+               items = checkpoint.remaining()
+               logger.info(f"Resuming from checkpoint: {len(items)} items left, removed {len(removed)} partial files")
+           else:
+               logger.warning(f"No checkpoint found in {download_root}, starting a fresh run")
+
+       if items is None:
+           all_content = []
+           if config['discovery'] == 'api':
+               with metrics.span('discovery_api'):
+                   all_content = discover_content_api(page, config, course_url)
+           if not all_content:
+               with metrics.span('discovery_dom'):
+                   if page.url != course_url:
+                       page.get(course_url)
+                       wait_ele(page, "xpath://button[starts-with(@id, 'folder-title-')]", timeout=config['timeout'], name='outline')
+                   all_content = discover_content(page, config)
+           if not all_content:
+               logger.error(f"No content found for {course_url}")
+               return None
+           if interactive:
+               print("\nFound content:")
+               for i, (url, title, week) in enumerate(all_content):
+                   print(f"{i}: [{week}] {title}")
+
+           items = [(url, title, create_week_folder(week, download_root)) for url, title, week in all_content]
+           if manifest:
+               # 与manifest比较，只下载新增或有变化的内容
+               remote = None
+               if downloader:
+                   remote = downloader.remote_meta_all([url for url, _, _ in items], workers=config['http_workers']).get
+               items = manifest.pending(items, remote)
+           elif interactive:
+               start_index = int(input(f"\nEnter the starting index (0-{len(all_content)-1}): "))
+               items = items[start_index:]
+           checkpoint.start(items)
+
+       if not items:
+           logger.info(f"Everything is up to date in {download_root}")
+           checkpoint.clear()
+           return []
+
+       def on_done(item, result):
+           url, title, week_folder = item
+           path = result if isinstance(result, str) else None
+           remote = downloader.meta.get(url) if downloader else None
+           digest = None
+           if store and path:
+               # 按内容存储一次，再链接到周文件夹
+               digest = store.add(path, remote, url)
+           checkpoint.mark_done(item)
+           metrics.count('files')
+           if path and metrics.enabled():
+               metrics.count('bytes', os.path.getsize(path))
+           if manifest:
+               manifest.record(url, title, week_folder, path, remote, digest)
+           if converter and path:
+               # 下载完成即开始转换，与后续下载并行
+               converter.submit(path)
+
+       def on_failed(item):
+           metrics.count('failed_items')
+           entry = report.items.get(item[0], {})
+           checkpoint.mark_failed(item, entry.get('error'))
+
+       policy = RetryPolicy.from_config(config)
+       breaker = CircuitBreaker(str(download_root), config['breaker_threshold'], config['breaker_cooldown'])
+       report = FailureReport()
+
+       if downloader:
+           with metrics.span('http_downloads'):
+               items = downloader.download_all(items, workers=config['http_workers'], on_done=on_done,
+                                               policy=policy, breaker=breaker)
+           logger.info(f"{len(items)} items left for the browser")
+       download_fn = with_retries(lambda tab, *item: download_content(tab, *item, downloader=downloader),
+                                  policy, breaker, report, item_slice=slice(1, 4))
+       with metrics.span('browser_downloads'):
+           failed = download_all(page, items, download_fn, workers=config['workers'],
+                                 on_done=on_done, on_failed=on_failed)
+       if failed:
+           path = report.write(Path(download_root) / 'failed_items.json')
+           logger.warning(f"{len(failed)} items failed to download (see {path}), run with --resume to retry them")
+       else:
+           checkpoint.clear()
+       return failed
+
+   except Exception as e:
+       logger.error(f"Error occurred in {course_url}: {e}")
+       if checkpoint.exists():
+           logger.info("Progress is saved, run with --resume to continue")
+       return None
+
+   finally:
+       if manifest:
+           manifest.close()
+
+def run_course_pipeline(page, config, course_url, download_root, downloader=None, resume=False, store=None,
+                        converter=None, index=None):
+   """
+   Crawl one course with discovery, download, conversion and indexing running as one pipeline.
+
+   Downloads start as soon as the first week is discovered. Returns the list of failed items.
+   """
+   Path(download_root).mkdir(parents=True, exist_ok=True)
+   manifest = Manifest.for_download_path(download_root) if config['incremental'] else None
+   checkpoint = Checkpoint.for_download_path(download_root)
+   policy = RetryPolicy.from_config(config)
+   breaker = CircuitBreaker(str(download_root), config['breaker_threshold'], config['breaker_cooldown'])
+   report = FailureReport()
+   failed = []
+   lock = threading.Lock()
+
+   def discovered():
+       for links in iter_content(page, config, course_url):
+           batch = [(url, title, create_week_folder(week, download_root)) for url, title, week in links]
+           if manifest:
+               remote = None
+               if downloader:
+                   remote = downloader.remote_meta_all([url for url, _, _ in batch], workers=config['http_workers']).get
+               batch = manifest.pending(batch, remote)
+           checkpoint.extend(batch)
+           yield batch
+
+   if resume and checkpoint.load():
+       removed = cleanup_partials(download_root)
+       batches = [checkpoint.remaining()]
+       logger.info(f"Resuming from checkpoint: {len(batches[0])} items left, removed {len(removed)} partial files")
+   else:
+       checkpoint.start([])
+       batches = discovered()
+
+   def done(item, result):
+       url, title, week_folder = item
+       path = result if isinstance(result, str) else None
+       remote = downloader.meta.get(url) if downloader else None
+       with lock:
+           digest = store.add(path, remote, url) if store and path else None
+           checkpoint.mark_done(item)
+           metrics.count('files')
+           if path and metrics.enabled():
+               metrics.count('bytes', os.path.getsize(path))
+           if manifest:
+               manifest.record(url, title, week_folder, path, remote, digest)
+       return ('convert', path) if converter and path else None
+
+   http_download = with_retries(downloader.download, policy, breaker, retry_falsy=False) if downloader else None
+   browser_download = with_retries(lambda tab, *item: download_content(tab, *item, downloader=downloader),
+                                   policy, breaker, report, item_slice=slice(1, 4))
+   # 发现阶段一直占用 page，下载使用单独的标签页
+   tabs = [open_tab(page) for _ in range(max(1, config['workers']))]
+
+   def fetch_http(worker, item):
+       path = http_download(*item)
+       return done(item, path) if path else ('browser', item)
+
+   def fetch_browser(worker, item):
+       result = browser_download(tabs[worker], *item)
+       if result:
+           return done(item, result)
+       with lock:
+           metrics.count('failed_items')
+           failed.append(item)
+           checkpoint.mark_failed(item, report.items.get(item[0], {}).get('error'))
+       return None
+
+   def fetch_failed(item, error):
+       # 处理函数本身出错（例如记录manifest时）也算失败，否则条目既没完成也没失败，检查点还会被清除
+       with lock:
+           metrics.count('failed_items')
+           failed.append(item)
+           report.add(item, error, 1)
+           checkpoint.mark_failed(item, str(error))
+
+   def convert(worker, path):
+       future = converter.submit(path)
+       if future is None:
+           return None
+       src, dst, status = future.result()
+       return ('index', dst) if index and status == 'converted' else None
+
+   def add_to_index(worker, path):
+       index.update_file(path)
+
+   stages = []
+   if downloader:
+       stages.append(Stage('http', fetch_http, config['http_workers'], on_error=fetch_failed))
+   stages.append(Stage('browser', fetch_browser, len(tabs), on_error=fetch_failed))
+   if converter:
+       stages.append(Stage('convert', convert, os.cpu_count()))
+       if index:
+           stages.append(Stage('index', add_to_index, 1))
+
+   try:
+       with metrics.span('pipeline'):
+           counts = Pipeline(stages).run(batches)
+       logger.info(f"Pipeline finished: {counts}")
+       if failed:
+           path = report.write(Path(download_root) / 'failed_items.json')
+           logger.warning(f"{len(failed)} items failed to download (see {path}), run with --resume to retry them")
+       else:
+           checkpoint.clear()
+       return failed
+   finally:
+       for tab in tabs:
+           try:
+               tab.close()
+           except Exception as e:
+               logger.debug(f"Failed to close tab: {e}")
+       if manifest:
+           manifest.close()
+
+def run_courses(page, config, courses, downloader=None, resume=False, store=None, converter=None, index=None):
+   """Crawl every course of {name: url} concurrently, one tab per course"""
+   def run(name, url):
+       tab = open_tab(page)
+       try:
+           root = Path(config['download_path']) / safe_filename(name)
+           return run_course(tab, config, url, root, downloader, resume, interactive=False, store=store,
+                             converter=converter, index=index)
+       finally:
+           tab.close()
+
+   with ThreadPoolExecutor(max_workers=max(1, config['course_workers'])) as pool:
+       futures = {name: pool.submit(run, name, url) for name, url in courses.items()}
+   for name, future in futures.items():
+       failed = future.result()
+       if failed is None:
+           logger.error(f"[{name}] could not be crawled")
+       else:
+           logger.info(f"[{name}] done, {len(failed)} failed items")
+
+def main(resume=False, batch=False):
    config = load_config()
    Path(config['download_path']).mkdir(parents=True, exist_ok=True)
+   diagnostics.configure(config['diagnostics'], config['diagnostics_dir'])
+   metrics.configure(config['metrics'], config['metrics_dir'])
+   # 记住每类页面上成功的下载点击顺序，下次直接使用
+   strategies.configure(os.path.join(config['download_path'], strategies.STRATEGIES_NAME))
+   downloader = None
+   # 所有课程共用一个内容存储，跨课程去重
+   store = BlobStore.for_download_path(config['download_path'], config['link_mode']) if config['dedup'] else None
+   index = Retriever(config['index_path'], make_embedder(config['embedder'])) if config['index'] else None
+   converter = None
+   if config['convert']:
+       # 流水线模式下由单独的索引阶段处理转换结果
+       converter = Converter(config['download_path'], config['markdown_path'],
+                             on_converted=index.update_file if index and not config['pipeline'] else None)
    
-   co = ChromiumOptions()
-   co.auto_port()
-   co.timeout_base = config['timeout']
-   page = ChromiumPage(co)
+   page = prepare_tab(ChromiumPage(build_options(config)))
 
    try:
-       username, password = get_credentials()
-       course_url = "https://abdn.blackboard.com/ultra/courses/_66721_1/outline"
-       logger.info("Accessing course page...")
-       
-       page.get(course_url)
-       page.wait.eles_loaded(config['selectors']['username'])
-       page.ele(config['selectors']['username']).input(username)
-       page.ele(config['selectors']['password']).input(password)
-       page.ele(config['selectors']['login_button']).click()
-
-       logger.info("Waiting for Lectures & Practical Sessions button...") 
-       time.sleep(5)
-       
-       lectures_button = page.ele(config['selectors']['lectures_button'])
-       
-       if not lectures_button:
-           logger.error("Lectures button not found by ID, trying alternative method...")
-           lectures_button = page.ele("xpath://button[contains(text(), 'Lectures & Practical Sessions')]")
-       
-       if not lectures_button:
-           logger.error("Cannot find Lectures button")
-           return
-           
-       logger.info("Found Lectures button, clicking...")
-       if lectures_button.attr('aria-expanded') == 'false':
-           lectures_button.click()
-           time.sleep(2)
-           scroll_to_bottom(page)
-       
-       logger.info("Lectures section expanded")
-
-       week_buttons = page.eles(config['selectors']['week_buttons'])
-       logger.info(f"Found {len(week_buttons)} week folders")
-
-       all_content = []
-       for week_button in week_buttons:
-           content = get_week_content(page, week_button)
-           all_content.extend(content)
-           scroll_to_bottom(page)
-           time.sleep(1)
-
-       logger.info(f"Found {len(all_content)} content items")
-       print("\nFound content:")
-       for i, (url, title, week) in enumerate(all_content):
-           print(f"{i}: [{week}] {title}")
-
-       if not all_content:
-           logger.error("No content found")
-           return
-
-       start_index = int(input(f"\nEnter the starting index (0-{len(all_content)-1}): "))
-
-       for url, title, week in tqdm(all_content[start_index:], desc="Download progress"):
-           week_folder = create_week_folder(week)
-           download_content(page, url, title, week_folder)
-           
+       courses = load_courses(config['courses_file']) if batch else None
+       first_url = next(iter(courses.values())) if courses else config['course_url']
+       # 只登录一次，所有课程共用同一个会话
+       with metrics.span('login'):
+           login(page, config, first_url)
+
+       if config['download_mode'] == 'http':
+           downloader = HttpDownloader.from_page(page, timeout=config['timeout'], pool_size=config['http_workers'],
+                                                 store=store)
+
+       with metrics.span('crawl'):
+           if batch:
+               logger.info(f"Crawling {len(courses)} courses from {config['courses_file']}")
+               run_courses(page, config, courses, downloader, resume, store=store, converter=converter,
+                           index=index)
+           else:
+               run_course(page, config, config['course_url'], config['download_path'], downloader, resume,
+                          store=store, converter=converter, index=index)
 
    except Exception as e:
        logger.error(f"Error occurred: {e}")
 
    finally:
+       if downloader:
+           downloader.close()
+       if store:
+           store.close()
+       strategies.save()
+       if converter:
+           # 补上之前运行中已下载但未转换的文件，再等待全部转换完成
+           with metrics.span('convert_drain'):
+               converter.scan()
+               converter.close()
+       if index:
+           with metrics.span('index'):
+               index.update_tree(config['markdown_path'])
+       for name, (count, total, longest) in wait_report().items():
+           logger.info(f"Waited for {name}: {count}x, {total:.1f}s total, {longest:.1f}s max")
        page.quit()
+       metrics.write()
 
 if __name__ == "__main__":
-   main()
\ No newline at end of file
+   parser = argparse.ArgumentParser(description="Download course materials from Blackboard Ultra")
+   parser.add_argument('--resume', action='store_true', help="continue the last interrupted run from its checkpoint")
+   parser.add_argument('--batch', action='store_true', help="crawl every course listed in course.json")
+   args = parser.parse_args()
+   main(resume=args.resume, batch=args.batch)
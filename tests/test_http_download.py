@@ -0,0 +1,123 @@
+# tests/test_http_download.py
+"""
+HttpDownloader against the local fake Ultra site.
+
+    python -m pytest tests        # 或 python -m unittest discover -s tests -t .
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.fake_ultra import FakeUltra, Item, Course, DOCUMENT, FILE, FOLDER
+from benchmarks.run import login
+from blackboard.http_download import HttpDownloader
+from blackboard.retry_policy import RetryPolicy, Throttled
+
+
+def _course():
+    week = Item('_200002_1', 'Week 1 - Automata', FOLDER, children=[
+        Item('_200003_1', 'Lecture 1.1', FILE, 150000),
+        Item('_200004_1', 'Reading 1.2', DOCUMENT, 70000, ext='pptx'),
+    ])
+    return Course('_66900_1', 'Test course', [Item('_200001_1', 'Lectures', FOLDER, children=[week])])
+
+
+class HttpDownloaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.course = _course()
+        cls.server = FakeUltra([cls.course]).start()
+        cls.cookies = login(cls.server)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.downloader = HttpDownloader(self.cookies, timeout=5)
+        self.server.throttle = 0
+
+    def tearDown(self):
+        self.downloader.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def url(self, content_id, kind='file'):
+        return f"{self.server.origin}/ultra/courses/{self.course.id}/outline/{kind}/{content_id}"
+
+    def item(self, content_id):
+        return self.server.items[content_id][1]
+
+    def assertPayload(self, path, item):
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(item.payload()))
+
+    def assertNoPartials(self):
+        self.assertEqual([name for name in os.listdir(self.folder) if name.endswith('.part')], [])
+
+    def test_file(self):
+        url = self.url('_200003_1')
+        file_url, file_name = self.downloader.resolve(url)
+        self.assertIn('/bbcswebdav/', file_url)
+        self.assertEqual(file_name, 'Lecture 1.1.pdf')
+
+        path = self.downloader.download(url, 'Lecture 1.1', self.folder)
+        self.assertEqual(path, os.path.join(self.folder, 'Lecture 1.1.pdf'))
+        self.assertPayload(path, self.item('_200003_1'))
+        self.assertEqual(self.downloader.meta[url]['etag'], self.item('_200003_1').etag())
+
+    def test_attachment(self):
+        url = self.url('_200004_1', 'edit/document')
+        file_url, file_name = self.downloader.resolve(url)
+        self.assertTrue(file_url.endswith('/attachments/att_200004_1/download'))
+        self.assertEqual(file_name, 'Reading 1.2.pptx')
+
+        path = self.downloader.download(url, 'Reading 1.2', self.folder)
+        self.assertEqual(path, os.path.join(self.folder, 'Reading 1.2.pptx'))
+        self.assertPayload(path, self.item('_200004_1'))
+
+    def test_unresolvable_falls_back(self):
+        self.assertIs(self.downloader.download(self.url('_200002_1', 'folder'), 'Week 1', self.folder), False)
+        self.assertIs(self.downloader.download(self.url('_999999_1'), 'Missing', self.folder), False)
+
+    def test_throttled(self):
+        self.server.throttle = 1
+        with self.assertRaises(Throttled) as raised:
+            self.downloader.download(self.url('_200003_1'), 'Lecture 1.1', self.folder)
+        self.assertEqual(raised.exception.retry_after, 0)
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_throttled_retried(self):
+        self.server.throttle = 2
+        policy = RetryPolicy([(Throttled, 4, 0.01), (Exception, 1, 0.01)])
+        items = [(self.url('_200003_1'), 'Lecture 1.1', self.folder),
+                 (self.url('_200004_1', 'edit/document'), 'Reading 1.2', self.folder)]
+        done = []
+        pending = self.downloader.download_all(items, workers=2, policy=policy, on_done=lambda item, path: done.append(path))
+        self.assertEqual(pending, [])
+        self.assertEqual(sorted(os.path.basename(path) for path in done), ['Lecture 1.1.pdf', 'Reading 1.2.pptx'])
+        self.assertEqual(self.server.throttle, 0)
+        self.assertNoPartials()
+
+    def test_interrupted_leaves_no_part(self):
+        item = self.item('_200003_1')
+        payload = item.payload
+
+        def broken():
+            yield next(payload())
+            raise ConnectionResetError('connection lost')
+
+        item.payload = broken
+        try:
+            with self.assertRaises(Exception):
+                self.downloader.download(self.url('_200003_1'), 'Lecture 1.1', self.folder)
+        finally:
+            item.payload = payload
+        self.assertEqual(os.listdir(self.folder), [])
+
+
+if __name__ == '__main__':
+    unittest.main()